@@ -1,17 +1,52 @@
+import os
 import dash
 from dash import html, dcc, page_container
 import dash_bootstrap_components as dbc
+import diskcache
+from utils import compression, images, metrics, rate_limit
 from utils.chuck_norris import create_chuck_norris_banner
+from utils.jobs import LauncherDiskcacheManager
+from utils.paths import data_path
+from utils.scheduler import scheduler
+
+# Langsomme callbacks (DBpedia og NYT søgning) kører som background jobs i en job-kø på
+# disk (SQLite), så request tråde aldrig venter på langsomme endpoints
+background_callback_manager = LauncherDiskcacheManager(diskcache.Cache(data_path("callbacks", "cache")))
 
 # Initialize the Dash app with Bootstrap theme
 app = dash.Dash(
     __name__,
     use_pages=True,
-    external_stylesheets=[dbc.themes.BOOTSTRAP]
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    background_callback_manager=background_callback_manager
 )
 
 # Import pages to register them (must be after app instantiation)
-from pages import home, news, music, movies, books, dbpedia
+from pages import home, news, music, movies, books, dbpedia, search
+
+# Jobs forkes fra en launcher proces uden tråde - den forkes her, før appen starter
+# sine tråde (under gunicorn forkes den af master processen)
+background_callback_manager.start_launcher()
+
+# WSGI entry point til produktion, f.eks. `gunicorn app:server` (se gunicorn.conf.py)
+server = app.server
+
+# Prometheus metrics for callbacks, API kald og caches på /metrics
+metrics.init_app(server)
+
+# Lokal proxy der skalerer og cacher thumbnails til kortene på /thumbnails
+images.init_app(server)
+
+# Brugt og resterende NYT/YouTube kvote på /quota
+rate_limit.init_app(server)
+
+# gzip/brotli af callback svar og statiske filer (bundles caches komprimeret i hukommelsen)
+compression.init_app(server)
+
+# Start opdatering af udbydernes data i baggrunden (NYT, YouTube, Trakt, Sanity).
+# Under gunicorn med preload startes scheduleren i stedet i hver worker efter fork.
+if os.getenv("SCHEDULER_AUTOSTART", "1") != "0":
+    scheduler.start()
 
 # Sidebar navigation
 sidebar = dbc.Nav(
@@ -22,6 +57,7 @@ sidebar = dbc.Nav(
         dbc.NavLink("Movies", href="/movies", active="exact"),
         dbc.NavLink("Books", href="/books", active="exact"),
         dbc.NavLink("DBpedia", href="/dbpedia", active="exact"),
+        dbc.NavLink("Search", href="/search", active="exact"),
     ],
     vertical=True,
     pills=True,
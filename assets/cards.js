@@ -0,0 +1,122 @@
+// Bygger kortene for de paginerede lister i browseren.
+// Callbacks sender kun kompakte records (se <prefix>-items), og her laves de om til
+// de samme Bootstrap kort som før - så serveren ikke skal bygge og serialisere komponenttræer.
+(function () {
+    var CARD_STYLE = {borderRadius: "8px", border: "1px solid #e0e0e0"};
+    var IMAGE_STYLE = {width: "100%", height: "auto", objectFit: "cover", borderRadius: "8px", aspectRatio: "16 / 9"};
+
+    function component(namespace, type, props, children) {
+        props = Object.assign({}, props);
+        if (children !== undefined) {
+            props.children = children;
+        }
+        return {namespace: namespace, type: type, props: props};
+    }
+
+    function html(type, props, children) {
+        return component("dash_html_components", type, props, children);
+    }
+
+    function dbc(type, props, children) {
+        return component("dash_bootstrap_components", type, props, children);
+    }
+
+    function link(label, href, className) {
+        return html("A", {href: href, target: "_blank", className: className}, label);
+    }
+
+    // Billeder hentes gennem /thumbnails proxyen og først når de nærmer sig skærmen
+    // (data-src/data-srcset læses af assets/lazy-images.js)
+    function lazyImage(image) {
+        return html("Img", {
+            "data-src": image.src,
+            "data-srcset": image.srcset,
+            sizes: image.sizes,
+            alt: "",
+            className: "img-fluid",
+            style: Object.assign({}, IMAGE_STYLE, image.ratio ? {aspectRatio: image.ratio} : {})
+        });
+    }
+
+    // Kort med billede til venstre og indhold til højre - uden billede kun indholdet
+    function imageCard(image, body) {
+        var content = dbc("CardBody", {}, body);
+        if (image) {
+            content = dbc("Row", {className: "g-0"}, [
+                dbc("Col", {width: 4}, lazyImage(image)),
+                dbc("Col", {width: 8}, content)
+            ]);
+        }
+        return dbc("Card", {className: "mb-4 shadow-sm", style: CARD_STYLE}, content);
+    }
+
+    function renderList(items, renderItem) {
+        return items ? items.map(renderItem) : null;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        cards: {
+            news: function (items) {
+                return renderList(items, function (item) {
+                    return imageCard(item.image, [
+                        html("H5", {className: "card-title mb-2"}, item.title),
+                        html("P", {className: "card-text", style: {fontSize: "0.95rem"}}, item.abstract),
+                        html("Div", {}, [
+                            html("Small", {className: "text-muted d-block mb-2"}, [
+                                item.byline ? html("Strong", {}, "Af: ") : "",
+                                item.byline,
+                                item.details
+                            ]),
+                            link("Læs mere →", item.url, "btn btn-primary btn-sm")
+                        ])
+                    ]);
+                });
+            },
+
+            music: function (items) {
+                return renderList(items, function (item) {
+                    return imageCard(item.image, [
+                        html("H5", {className: "card-title mb-2"}, item.title),
+                        html("P", {className: "card-text", style: {fontSize: "0.9rem"}}, item.description),
+                        html("Div", {}, [
+                            html("Small", {className: "text-muted d-block mb-2"}, item.meta),
+                            link("▶️ Se på YouTube", item.url, "btn btn-danger btn-sm")
+                        ])
+                    ]);
+                });
+            },
+
+            movies: function (items) {
+                return renderList(items, function (item) {
+                    return dbc("Card", {className: "mb-3"}, dbc("CardBody", {}, [
+                        html("H5", {className: "card-title"}, item.title),
+                        html("P", {className: "card-text"}, item.overview),
+                        html("Small", {className: "text-muted"}, "Set: " + item.watched),
+                        html("Br", {}),
+                        link("Se på Trakt.tv", item.url, "btn btn-sm btn-primary mt-2")
+                    ]));
+                });
+            },
+
+            search: function (items) {
+                return renderList(items, function (item) {
+                    return imageCard(item.image, [
+                        dbc("Badge", {color: "secondary", className: "mb-2"}, item.source),
+                        html("H5", {className: "card-title mb-2"}, item.url ? link(item.title, item.url) : item.title),
+                        item.text ? html("P", {className: "card-text", style: {fontSize: "0.9rem"}}, item.text) : null,
+                        html("Small", {className: "text-muted d-block"}, item.meta)
+                    ]);
+                });
+            },
+
+            books: function (items) {
+                return renderList(items, function (item) {
+                    return dbc("Card", {className: "mb-4 shadow-sm", style: CARD_STYLE}, dbc("CardBody", {}, [
+                        html("H4", {className: "card-title mb-2"}, item.title),
+                        html("Div", {}, html("Small", {className: "text-muted d-block mb-2"}, item.meta))
+                    ]));
+                });
+            }
+        }
+    });
+})();
@@ -0,0 +1,62 @@
+// Lazy loading af kortenes billeder.
+// Dash' html.Img har ingen loading="lazy", så cards.js sætter data-src/data-srcset,
+// og her flyttes de over i src/srcset når billedet nærmer sig skærmen.
+(function () {
+    function load(img) {
+        if (img.dataset.srcset) {
+            img.srcset = img.dataset.srcset;
+        }
+        img.src = img.dataset.src;
+        img.dataset.loaded = img.dataset.src;
+    }
+
+    var observer = null;
+    if ("IntersectionObserver" in window) {
+        observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    load(entry.target);
+                }
+            });
+        }, {rootMargin: "200px"});
+    }
+
+    function watch(img) {
+        // React genbruger <img> elementer når man blader, så et nyt data-src skal hentes igen
+        if (!img.dataset.src || img.dataset.loaded === img.dataset.src) {
+            return;
+        }
+        if (observer) {
+            observer.observe(img);
+        } else {
+            load(img);
+        }
+    }
+
+    function scan(root) {
+        if (root.matches && root.matches("img[data-src]")) {
+            watch(root);
+        }
+        if (root.querySelectorAll) {
+            root.querySelectorAll("img[data-src]").forEach(watch);
+        }
+    }
+
+    new MutationObserver(function (mutations) {
+        mutations.forEach(function (mutation) {
+            if (mutation.type === "attributes") {
+                watch(mutation.target);
+            } else {
+                mutation.addedNodes.forEach(scan);
+            }
+        });
+    }).observe(document.documentElement, {
+        childList: true,
+        subtree: true,
+        attributes: true,
+        attributeFilter: ["data-src"]
+    });
+
+    scan(document);
+})();
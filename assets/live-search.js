@@ -0,0 +1,42 @@
+// Søgning mens man skriver på News og DBpedia.
+// Hver indtastning får en ny generation, og kun den nyeste sendes videre til serveren
+// når brugeren har holdt pause - så hurtig skrivning giver ét kald til API'et.
+// En ny søgning annullerer samtidig serverens igangværende job for den forrige (Dash oldJob).
+(function () {
+    var generations = {};
+
+    function normalize(value) {
+        return (value || "").trim().replace(/\s+/g, " ");
+    }
+
+    // delay: pause i ms før søgningen sendes, minLength: korteste søgning der sendes
+    // (en tom søgning sendes altid, så siden kan vise sin standardvisning igen)
+    function liveSearch(key, delay, minLength) {
+        return function (value, live, previous) {
+            var noUpdate = window.dash_clientside.no_update;
+            if (!live) {
+                return noUpdate;
+            }
+            var generation = (generations[key] || 0) + 1;
+            generations[key] = generation;
+            var query = normalize(value);
+            return new Promise(function (resolve) {
+                setTimeout(function () {
+                    var superseded = generations[key] !== generation;
+                    var unchanged = (previous ? previous.query : "") === query;
+                    var tooShort = query.length > 0 && query.length < minLength;
+                    resolve(superseded || unchanged || tooShort ? noUpdate : {query: query, generation: generation});
+                }, delay);
+            });
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        live: {
+            // NYT har 5 kald i minuttet - vent lidt længere før der søges
+            news: liveSearch("news", 600, 3),
+            // DBpedia's fuldtekst-indeks kræver ord på mindst 4 tegn
+            dbpedia: liveSearch("dbpedia", 400, 4)
+        }
+    });
+})();
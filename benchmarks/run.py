@@ -0,0 +1,278 @@
+"""Benchmark af sidernes callbacks mod stub serveren - p50/p95/p99 latency og throughput
+
+Callbacks kaldes gennem Dash' eget endpoint (/_dash-update-component) med Flask' test
+client, så tallene inkluderer serialisering og background callbacks' job-kø.
+
+    # Optag fixtures én gang (kræver netværk og API nøgler i .env)
+    python -m benchmarks.run --record
+
+    # Kør offline
+    python -m benchmarks.run --iterations 50 --concurrency 4 --latency 80 --jitter 40
+    python -m benchmarks.run --cold --only dashboard,dbpedia --json results.json
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import stub_server
+
+# Identifikatorer der indgår i URL'erne og derfor skal være de samme ved afspilning
+REPLAY_ENV = ["TRAKT_USERNAME", "SANITY_PROJECT_ID", "SANITY_DATASET", "SANITY_API_VERSION", "YOUTUBE_PLAYLIST_ID"]
+
+# Nøgler der ikke gemmes - ved afspilning sættes de til en dummy værdi hvis de var sat under optagelse
+SECRET_ENV = ["NYT_API_KEY", "YOUTUBE_API_KEY", "TRAKT_CLIENT_ID"]
+
+# Hvor ofte (sekunder) en background callback spørges om den er færdig
+POLL_INTERVAL = 0.02
+
+# Højeste ventetid (sekunder) på én callback før kaldet tælles som fejl
+CALL_TIMEOUT = 60
+
+# name -> (output id der identificerer callbacken, input/state værdier, ændrede inputs, tæller)
+# Et output id der slutter med @ er et allow_duplicate output, f.eks. en background callback der
+# skriver til samme komponent som sidens almindelige callback.
+# Tælleren (et n_clicks input eller et felt i et dict input, f.eks. "news-search.data.n") får et
+# nyt tal for hvert kald, så samtidige kald til en background callback ikke får samme job-nøgle
+# og deler resultat.
+SCENARIOS = {
+    "dashboard": ("movies-count", {"home-data-trigger.data": None}, ["home-data-trigger.data"], None),
+    "news": (
+        "news-trigger",
+        {"news-page-size.value": "10", "news-pagination.active_page": 1},
+        ["news-trigger.data"],
+        "show-most-viewed-btn.n_clicks"
+    ),
+    "news-search": (
+        "news-prefetch",
+        {"news-search.data": {"query": "climate", "page": 1}},
+        ["news-search.data"],
+        "news-search.data.n"
+    ),
+    "music": ("music-content", {"music-page-size.value": "10", "music-pagination.active_page": 1}, ["music-trigger.data"], None),
+    "movies": ("movies-content", {"movies-page-size.value": "10", "movies-pagination.active_page": 1}, ["movies-trigger.data"], None),
+    "books": ("books-content", {"books-page-size.value": "10", "books-pagination.active_page": 1}, ["books-trigger.data"], None),
+    "dbpedia": (
+        "dbpedia-content@",
+        {"dbpedia-query.data": {"term": "star wars"}},
+        ["dbpedia-query.data"],
+        "dbpedia-query.data.n"
+    ),
+}
+
+
+def prepare_env(args, server):
+    """Sætter environment før appen importeres - alle kald går til stub serveren"""
+    env_path = os.path.join(args.fixtures, "env.json")
+    os.environ["HTTP_UPSTREAM_OVERRIDE"] = f"http://127.0.0.1:{server.server_port}"
+    # Egen data mappe, så lokale indeks og disk caches ikke blandes med appens
+    os.environ["MASHUP_DATA_DIR"] = tempfile.mkdtemp(prefix="mashup-bench-")
+    os.environ["SCHEDULER_ENABLED"] = "0"
+
+    if args.record:
+        from dotenv import load_dotenv
+        load_dotenv()
+        recorded = {name: os.environ[name] for name in REPLAY_ENV if os.getenv(name)}
+        recorded["secrets"] = [name for name in SECRET_ENV if os.getenv(name)]
+        os.makedirs(args.fixtures, exist_ok=True)
+        with open(env_path, "w", encoding="utf-8") as f:
+            json.dump(recorded, f, indent=1)
+        return
+
+    # Fixtures er optaget - rate limits, kvoter og rigtige nøgler er ikke relevante offline
+    os.environ.setdefault("NYT_RATE_PER_MINUTE", "0")
+    os.environ.setdefault("NYT_QUOTA_PER_DAY", "0")
+    os.environ.setdefault("YOUTUBE_QUOTA_PER_DAY", "0")
+    if os.path.exists(env_path):
+        with open(env_path, encoding="utf-8") as f:
+            recorded = json.load(f)
+        for name in REPLAY_ENV:
+            if name in recorded:
+                os.environ[name] = recorded[name]
+        for name in recorded.get("secrets", []):
+            os.environ[name] = "replay"
+
+
+def reset_state():
+    """Tømmer caches og indeks, så næste kald går hele vejen til (stub) API'et"""
+    from utils import cache, circuit_breaker, providers, rate_limit, sparql
+    from utils.scheduler import scheduler
+    from utils.store import mirror
+
+    cache.cache.clear()
+    cache.shared_cache.clear()
+    mirror.clear()
+    sparql.result_cache.clear()
+    rate_limit.ledger.clear()
+    circuit_breaker.store.clear()
+    providers.playlist_sync.clear()
+    if providers.trakt_sync is not None:
+        providers.trakt_sync.clear()
+    for job in scheduler.jobs.values():
+        job.value = None
+        job.error = None
+        job.updated_at = None
+
+
+def find_callback(dependencies, output_id):
+    for dependency in dependencies:
+        for spec in dependency["output"].strip(".").split("..."):
+            component_id = spec.split(".", 1)[0] + ("@" if "@" in spec else "")
+            if component_id == output_id:
+                return dependency
+    raise KeyError(f"Ingen callback med output {output_id}")
+
+
+def with_counter(values, counter, number):
+    """Sætter tælleren til number - "id.prop" er et input, "id.prop.felt" et felt i et dict input"""
+    if not counter:
+        return values
+    component_id, prop, *field = counter.split(".", 2)
+    key = f"{component_id}.{prop}"
+    return {**values, key: {**values[key], field[0]: number} if field else number}
+
+
+def build_payload(dependency, values, changed):
+    """Bygger en request som Dash' renderer ville sende den"""
+    def props(items):
+        return [
+            {"id": item["id"], "property": item["property"], "value": values.get(f"{item['id']}.{item['property']}")}
+            for item in items
+        ]
+
+    output = dependency["output"]
+    if output.startswith(".."):
+        outputs = [dict(zip(("id", "property"), spec.split(".", 1))) for spec in output.strip(".").split("...")]
+    else:
+        outputs = dict(zip(("id", "property"), output.split(".", 1)))
+    return {
+        "output": output,
+        "outputs": outputs,
+        "inputs": props(dependency["inputs"]),
+        "state": props(dependency.get("state", [])),
+        "changedPropIds": changed
+    }
+
+
+def call(client, payload):
+    """Kalder en callback og venter på resultatet - returnerer HTTP status"""
+    deadline = time.perf_counter() + CALL_TIMEOUT
+    response = client.post("/_dash-update-component", json=payload)
+    body = response.get_json(silent=True) or {}
+    # Background callbacks svarer med et job, som der spørges til indtil svaret er klar
+    while response.status_code == 200 and "cacheKey" in body and "response" not in body:
+        if time.perf_counter() > deadline:
+            return 504
+        time.sleep(POLL_INTERVAL)
+        response = client.post(
+            "/_dash-update-component", json=payload, query_string={"cacheKey": body["cacheKey"], "job": body["job"]}
+        )
+        body = {**body, **(response.get_json(silent=True) or {})}
+    return response.status_code
+
+
+def percentile(values, pct):
+    """Nearest-rank percentil af en sorteret liste"""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def run_scenario(app, dependencies, name, iterations, warmup, concurrency, cold):
+    output_id, values, changed, counter = SCENARIOS[name]
+    dependency = find_callback(dependencies, output_id)
+
+    def timed_call(number):
+        client = app.server.test_client()
+        payload = build_payload(dependency, with_counter(values, counter, number + 1), changed)
+        if cold:
+            reset_state()
+        start = time.perf_counter()
+        status = call(client, payload)
+        return time.perf_counter() - start, status
+
+    for number in range(warmup):
+        timed_call(number)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_call, range(warmup, warmup + iterations)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "scenario": name,
+        "iterations": iterations,
+        "errors": sum(1 for _, status in results if status >= 400),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "throughput": iterations / elapsed
+    }
+
+
+def print_results(results):
+    print(f"{'scenarie':<12} {'n':>5} {'fejl':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'kald/s':>8}")
+    for r in results:
+        print(
+            f"{r['scenario']:<12} {r['iterations']:>5} {r['errors']:>5} {r['p50_ms']:>9.1f} "
+            f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} {r['throughput']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark af MashUp callbacks mod optagede API svar")
+    stub_server.add_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=30, help="kald per scenarie")
+    parser.add_argument("--warmup", type=int, default=2, help="kald før målingen starter")
+    parser.add_argument("--concurrency", type=int, default=1, help="samtidige kald")
+    parser.add_argument("--cold", action="store_true", help="tøm caches før hvert kald")
+    parser.add_argument("--only", help="kommasepareret liste af scenarier: " + ", ".join(SCENARIOS))
+    parser.add_argument("--json", help="gem resultaterne som JSON")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Ukendte scenarier: {', '.join(unknown)}")
+
+    server = stub_server.start_server(
+        record=args.record,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fixtures_dir=args.fixtures
+    )
+    prepare_env(args, server)
+
+    # Appen importeres først nu, hvor environment peger på stub serveren
+    from app import app
+    dependencies = app.server.test_client().get("/_dash-dependencies").get_json()
+
+    if args.record:
+        # Ét koldt kald per scenarie er nok til at optage alle de endpoints det bruger
+        for name in names:
+            reset_state()
+            run_scenario(app, dependencies, name, 1, 0, 1, cold=False)
+        print(f"Optog {len(server.store.fixtures)} fixtures i {args.fixtures}")
+        return
+
+    if not server.store.fixtures:
+        print(f"Advarsel: ingen fixtures i {args.fixtures} - kør først med --record", file=sys.stderr)
+
+    results = [
+        run_scenario(app, dependencies, name, args.iterations, args.warmup, args.concurrency, args.cold)
+        for name in names
+    ]
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
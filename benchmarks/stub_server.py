@@ -0,0 +1,196 @@
+"""Lokal stub server der optager og afspiller API svar til offline benchmarks
+
+Appen sendes hertil med HTTP_UPSTREAM_OVERRIDE=http://127.0.0.1:<port>, som omskriver
+https://host/sti til http://127.0.0.1:<port>/host/sti (se utils/http_client.py).
+
+    # Optag rigtige svar (kræver netværk og API nøgler i .env)
+    python -m benchmarks.stub_server --record
+
+    # Afspil offline med 50-80 ms latency og 2% fejl
+    python -m benchmarks.stub_server --latency 50 --jitter 30 --error-rate 0.02
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Samme som utils.cache.AUTH_PARAMS - importeres ikke, da utils læser environment ved import
+AUTH_PARAMS = {"api-key", "key"}
+
+# Headers fra det rigtige svar der gemmes og afspilles
+KEPT_HEADERS = {"content-type", "etag", "retry-after"}
+
+# Headers der ikke sendes videre til det rigtige API under optagelse
+SKIPPED_REQUEST_HEADERS = {"host", "accept-encoding", "connection", "content-length"}
+
+
+def fixture_key(host, path, query):
+    """Nøgle for et kald - API nøgler indgår ikke, så fixtures kan afspilles med andre nøgler"""
+    params = sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in AUTH_PARAMS)
+    return hashlib.sha256(f"{host}{path}?{urlencode(params)}".encode("utf-8")).hexdigest()[:20]
+
+
+class FixtureStore:
+    """Fixtures som én JSON fil per kald i fixtures/<host>/<nøgle>.json"""
+
+    def __init__(self, path=FIXTURES_DIR):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fixtures = {}
+        self.by_path = {}
+        self.load()
+
+    def load(self):
+        if not os.path.isdir(self.path):
+            return
+        for host in os.listdir(self.path):
+            host_dir = os.path.join(self.path, host)
+            if not os.path.isdir(host_dir):
+                continue
+            for name in sorted(os.listdir(host_dir)):
+                if name.endswith(".json"):
+                    with open(os.path.join(host_dir, name), encoding="utf-8") as f:
+                        self.add(json.load(f))
+
+    def add(self, fixture):
+        self.fixtures[fixture["key"]] = fixture
+        self.by_path.setdefault((fixture["host"], fixture["path"]), []).append(fixture)
+
+    def find(self, host, path, query):
+        """Præcis match på parametre - ellers første optagelse af samme endpoint (f.eks. tilfældige jokes)"""
+        fixture = self.fixtures.get(fixture_key(host, path, query))
+        if fixture is None:
+            candidates = self.by_path.get((host, path))
+            fixture = candidates[0] if candidates else None
+        return fixture
+
+    def save(self, fixture):
+        host_dir = os.path.join(self.path, fixture["host"])
+        os.makedirs(host_dir, exist_ok=True)
+        with open(os.path.join(host_dir, f"{fixture['key']}.json"), "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=1)
+        with self.lock:
+            self.add(fixture)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+        path = f"/{path}"
+
+        if server.record:
+            fixture = self.record(host, path, parts.query)
+        else:
+            if server.latency or server.jitter:
+                time.sleep((server.latency + random.uniform(0, server.jitter)) / 1000)
+            if server.error_rate and random.random() < server.error_rate:
+                return self.reply(server.error_status, {"content-type": "application/json"}, '{"error": "injected"}')
+            fixture = server.store.find(host, path, parts.query)
+            if fixture is None:
+                return self.reply(404, {"content-type": "application/json"}, json.dumps({"error": f"Ingen fixture for {host}{path}"}))
+
+        etag = fixture["headers"].get("etag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            return self.reply(304, {"etag": etag}, "")
+        self.reply(fixture["status"], fixture["headers"], fixture["body"])
+
+    def record(self, host, path, query):
+        """Henter det rigtige svar og gemmer det som fixture"""
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in SKIPPED_REQUEST_HEADERS}
+        # Optag altid hele svaret - ikke en 304 til appens egen ETag
+        headers.pop("If-None-Match", None)
+        url = f"https://{host}{path}" + (f"?{query}" if query else "")
+        response = requests.get(url, headers=headers, timeout=60)
+        fixture = {
+            "key": fixture_key(host, path, query),
+            "host": host,
+            "path": path,
+            "query": urlencode([(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in AUTH_PARAMS]),
+            "status": response.status_code,
+            "headers": {k.lower(): v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            "body": response.text
+        }
+        self.server.store.save(fixture)
+        return fixture
+
+    def reply(self, status, headers, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(port=0, record=False, latency=0, jitter=0, error_rate=0, error_status=503,
+                  fixtures_dir=FIXTURES_DIR, verbose=False):
+    """Opretter stub serveren - port 0 vælger en ledig port (se server.server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.store = FixtureStore(fixtures_dir)
+    server.record = record
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.verbose = verbose
+    return server
+
+
+def start_server(**kwargs):
+    """Starter stub serveren i en baggrundstråd og returnerer den"""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
+
+
+def add_arguments(parser):
+    parser.add_argument("--record", action="store_true", help="hent rigtige svar og gem dem som fixtures")
+    parser.add_argument("--latency", type=float, default=0, help="fast ekstra latency i ms per kald")
+    parser.add_argument("--jitter", type=float, default=0, help="tilfældig ekstra latency op til ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="andel af kald der får en fejlstatus (0-1)")
+    parser.add_argument("--error-status", type=int, default=503, help="statuskode for injicerede fejl")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="mappe med fixtures")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = create_server(
+        port=args.port,
+        record=args.record,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fixtures_dir=args.fixtures,
+        verbose=True
+    )
+    mode = "optager" if args.record else f"afspiller {len(server.store.fixtures)} fixtures"
+    print(f"Stub server {mode} på http://127.0.0.1:{server.server_port}")
+    print(f"Start appen med HTTP_UPSTREAM_OVERRIDE=http://127.0.0.1:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
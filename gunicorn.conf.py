@@ -0,0 +1,35 @@
+# Gunicorn konfiguration til produktion
+#
+#   pip install -e ".[production]"
+#   gunicorn app:server
+#
+# Appen indlæses én gang i master processen (preload) og forkes ind i workers.
+# Alle workers deler én SQLite (WAL) response cache, så N workers ikke holder
+# N kopier af cachen eller henter de samme data hver for sig, og kun én worker
+# (scheduler lederen) opdaterer udbydernes data i baggrunden.
+import multiprocessing
+import os
+
+# Skal sættes før master processen importerer appen
+os.environ.setdefault("CACHE_BACKEND", "sqlite")
+os.environ.setdefault("SCHEDULER_AUTOSTART", "0")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8050")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+# Background callbacks forkes af en launcher proces, som master processen starter før der
+# findes tråde (se utils/jobs.py), så hver worker trygt kan køre flere request tråde.
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # Tråde overlever ikke fork, så hver worker starter sine egne scheduler og metrics tråde.
+    # Kun den worker der holder scheduler låsen henter fra API'erne.
+    from utils import metrics
+    from utils.scheduler import scheduler
+    scheduler.start(elect_leader=True)
+    metrics.start_flusher()
@@ -1,10 +1,13 @@
 import dash
 from dash import html, dcc, callback, Output, Input
 import dash_bootstrap_components as dbc
-import requests
+from utils import metrics
+from utils.providers import ProviderError, get_provider_data
+from utils.store import mirror
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from utils.pagination import create_paginated_list, register_card_renderer, single_page
 
 load_dotenv()
 
@@ -15,143 +18,109 @@ layout = html.Div(
         html.H2("Books - Sanity Database", className="mb-4"),
         html.P("Bøger fra din Sanity database."),
         dcc.Store(id="books-trigger", data=True),  # Trigger for automatisk hentning
-        html.Div(id="books-content")
+        create_paginated_list("books")
     ]
 )
 
+register_card_renderer("books", "books")
+
 @callback(
     Output("books-content", "children"),
-    Input("books-trigger", "data")
+    Output("books-items", "data"),
+    Output("books-pagination", "max_value"),
+    Output("books-pagination", "active_page"),
+    Input("books-trigger", "data"),
+    Input("books-pagination", "active_page"),
+    Input("books-page-size", "value")
 )
-def fetch_books(trigger):
+@metrics.instrument_callback
+def fetch_books(trigger, active_page, page_size):
     """Henter bøger fra Sanity API automatisk"""
     try:
         # Sanity API konfiguration
         project_id = os.getenv("SANITY_PROJECT_ID", "")
-        dataset = os.getenv("SANITY_DATASET", "production")
-        api_version = os.getenv("SANITY_API_VERSION", "2023-01-01")
         
         if not project_id:
-            return dbc.Alert(
+            return single_page(dbc.Alert(
                 [
                     html.Strong("Sanity Project ID mangler!"),
                     html.Br(),
                     "Sæt venligst SANITY_PROJECT_ID i din .env fil."
                 ],
                 color="warning"
-            )
-        
-        # Sanity GROQ query - hent alle felter
-        query = '''*[_type == 'book'] {
-            _id,
-            _createdAt,
-            _updatedAt,
-            title,
-            number,
-            date,
-            completed
-        } | order(_createdAt desc) [0...20]'''
-        
-        url = f"https://{project_id}.api.sanity.io/v{api_version}/data/query/{dataset}"
-        params = {
-            "query": query
-        }
+            ))
         
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            books = data.get("result", [])
-            
-            if not books:
-                return dbc.Alert("Ingen bøger fundet i databasen", color="info")
-            
-            cards = []
-            for book in books:
-                title = book.get("title", "No title")
-                number = book.get("number", "")
-                date = book.get("date", "")
-                completed = book.get("completed", False)
-                created_at = book.get("_createdAt", "")
-                updated_at = book.get("_updatedAt", "")
-                
-                # Formatér datoer
-                formatted_date = ""
-                if date:
-                    try:
-                        dt = datetime.strptime(date, "%Y-%m-%d")
-                        formatted_date = dt.strftime("%d/%m/%Y")
-                    except:
-                        formatted_date = date
-                
-                formatted_created = ""
-                if created_at:
-                    try:
-                        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        formatted_created = dt.strftime("%d/%m/%Y")
-                    except:
-                        formatted_created = created_at[:10] if len(created_at) >= 10 else created_at
-                
-                # Opret card
-                card = dbc.Card(
+        # Bøgerne ligger i det lokale spejl, som scheduleren holder opdateret
+        try:
+            summary = get_provider_data("sanity_books")
+        except ProviderError as e:
+            if e.status_code == 401:
+                return single_page(dbc.Alert(
                     [
-                        dbc.CardBody(
-                            [
-                                html.H4(title, className="card-title mb-2"),
-                                html.Div(
-                                    [
-                                        html.Small(
-                                            [
-                                                f"Nummer: {number} | " if number else "",
-                                                f"Dato: {formatted_date} | " if formatted_date else "",
-                                                "✅ Færdig" if completed else "📖 I gang",
-                                                f" | Oprettet: {formatted_created}" if formatted_created else ""
-                                            ],
-                                            className="text-muted d-block mb-2"
-                                        )
-                                    ]
-                                )
-                            ]
-                        )
+                        html.Strong("401 Unauthorized"),
+                        html.Br(),
+                        "Tjek venligst at din Sanity Project ID er korrekt."
                     ],
-                    className="mb-4 shadow-sm",
-                    style={
-                        "borderRadius": "8px",
-                        "border": "1px solid #e0e0e0"
-                    }
-                )
-                cards.append(card)
-            
-            return html.Div([
-                html.H4("Mine Bøger", className="mb-3"),
-                *cards
-            ])
-        elif response.status_code == 401:
-            return dbc.Alert(
+                    color="danger"
+                ))
+            return single_page(dbc.Alert(
                 [
-                    html.Strong("401 Unauthorized"),
+                    html.Strong(f"Fejl ved hentning af bøger: {e.status_code}"),
                     html.Br(),
-                    "Tjek venligst at din Sanity Project ID er korrekt."
+                    e.text[:200] if len(e.text) > 200 else e.text
                 ],
                 color="danger"
-            )
-        else:
-            error_msg = response.text if hasattr(response, 'text') else "Ukendt fejl"
-            return dbc.Alert(
-                [
-                    html.Strong(f"Fejl ved hentning af bøger: {response.status_code}"),
-                    html.Br(),
-                    error_msg[:200] if len(error_msg) > 200 else error_msg
-                ],
-                color="danger"
-            )
+            ))
+        
+        if not summary["total"]:
+            return single_page(dbc.Alert("Ingen bøger fundet i databasen", color="info"))
+        
+        # Kun den synlige side læses fra spejlet - kortene bygges i browseren
+        visible_books, active_page, max_page = mirror.page("sanity_books", active_page, page_size)
+        records = []
+        for book in visible_books:
+            title = book.get("title", "No title")
+            number = book.get("number", "")
+            date = book.get("date", "")
+            completed = book.get("completed", False)
+            created_at = book.get("_createdAt", "")
+            updated_at = book.get("_updatedAt", "")
+            
+            # Formatér datoer
+            formatted_date = ""
+            if date:
+                try:
+                    dt = datetime.strptime(date, "%Y-%m-%d")
+                    formatted_date = dt.strftime("%d/%m/%Y")
+                except:
+                    formatted_date = date
+            
+            formatted_created = ""
+            if created_at:
+                try:
+                    dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                    formatted_created = dt.strftime("%d/%m/%Y")
+                except:
+                    formatted_created = created_at[:10] if len(created_at) >= 10 else created_at
+            
+            records.append({
+                "title": title,
+                "meta": "".join([
+                    f"Nummer: {number} | " if number else "",
+                    f"Dato: {formatted_date} | " if formatted_date else "",
+                    "✅ Færdig" if completed else "📖 I gang",
+                    f" | Oprettet: {formatted_created}" if formatted_created else ""
+                ])
+            })
+        
+        return html.H4("Mine Bøger", className="mb-3"), records, max_page, active_page
     except Exception as e:
-        return dbc.Alert(
+        return single_page(dbc.Alert(
             [
                 html.Strong("Fejl:"),
                 html.Br(),
                 str(e)
             ],
             color="danger"
-        )
+        ))
 
@@ -1,8 +1,9 @@
 import dash
-from dash import html, dcc, callback, Output, Input
+from dash import html, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import requests
-from SPARQLWrapper import SPARQLWrapper, JSON
+from utils import metrics
+from utils.sparql import SEARCH_TYPES, search_all
 
 dash.register_page(__name__, path="/dbpedia", name="DBpedia")
 
@@ -17,143 +18,147 @@ layout = html.Div(
                     placeholder="Søg efter film, bøger, musik, osv... (f.eks. 'Harry Potter', 'The Beatles')",
                     type="text"
                 ),
-                dbc.Button("Søg", id="dbpedia-search-btn", color="primary")
+                dbc.Button("Søg", id="dbpedia-search-btn", color="primary"),
+                dbc.Button("Annuller", id="dbpedia-cancel-btn", color="secondary", style={"display": "none"})
             ],
-            className="mb-4"
+            className="mb-2"
+        ),
+        dbc.Switch(id="dbpedia-live", label="Søg mens du skriver", value=True, className="mb-4"),
+        dbc.Progress(
+            id="dbpedia-progress",
+            value=0,
+            max=len(SEARCH_TYPES),
+            striped=True,
+            animated=True,
+            className="mb-4",
+            style={"display": "none"}
         ),
         dcc.Store(id="dbpedia-trigger", data=True),
+        dcc.Store(id="dbpedia-search-request"),  # Seneste søgning fra søg-mens-du-skriver (query, generation)
+        dcc.Store(id="dbpedia-query"),  # Søgning der skal hentes i job-køen (term)
         html.Div(id="dbpedia-content")
     ]
 )
 
-def execute_sparql_query(query):
-    """Udfører en SPARQL query mod DBpedia"""
-    try:
-        # Brug DBpedia's offentlige SPARQL endpoint
-        sparql = SPARQLWrapper("https://dbpedia.org/sparql")
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        sparql.setTimeout(60)  # Øg timeout til 60 sekunder
-        sparql.setMethod("GET")  # Brug GET i stedet for POST for bedre caching
-        results = sparql.query().convert()
-        return results
-    except Exception as e:
-        return {"error": str(e)}
+# Søg mens du skriver - debounce og generationer i browseren (assets/live-search.js)
+clientside_callback(
+    ClientsideFunction(namespace="live", function_name="dbpedia"),
+    Output("dbpedia-search-request", "data"),
+    Input("dbpedia-search", "value"),
+    State("dbpedia-live", "value"),
+    State("dbpedia-search-request", "data"),
+    prevent_initial_call=True
+)
+
+def welcome_view():
+    """Vises når der ikke er en søgeterm - eksempel queries"""
+    return html.Div([
+        dbc.Alert(
+            [
+                html.Strong("Velkommen til DBpedia søgning!"),
+                html.Br(),
+                "Indtast en søgeterm for at finde information fra DBpedia. ",
+                "Du kan søge efter film, bøger, musikere, osv."
+            ],
+            color="info",
+            className="mb-4"
+        ),
+        html.H4("Eksempel queries:", className="mb-3"),
+        dbc.Card(
+            [
+                dbc.CardBody(
+                    [
+                        html.H5("Populære film", className="card-title"),
+                        html.P("Henter information om populære film fra DBpedia."),
+                        dbc.Button(
+                            "Kør eksempel query",
+                            id="example-movies-btn",
+                            color="secondary",
+                            size="sm",
+                            className="mt-2"
+                        )
+                    ]
+                )
+            ],
+            className="mb-3"
+        )
+    ])
 
 @callback(
     Output("dbpedia-content", "children"),
+    Output("dbpedia-query", "data"),
     Input("dbpedia-search-btn", "n_clicks"),
     Input("dbpedia-search", "n_submit"),
+    Input("dbpedia-search-request", "data"),
     Input("dbpedia-trigger", "data"),
-    dash.dependencies.State("dbpedia-search", "value"),
+    State("dbpedia-search", "value"),
     prevent_initial_call=False
 )
-def search_dbpedia(search_clicks, search_submit, trigger, search_term):
-    """Søger i DBpedia baseret på søgeterm"""
+@metrics.instrument_callback
+def request_dbpedia(search_clicks, search_submit, live_request, trigger, search_term):
+    """Viser eksempel queries uden søgeterm - ellers sendes søgetermen til job-køen"""
+    ctx = dash.callback_context
+    if ctx.triggered and ctx.triggered[0]["prop_id"] == "dbpedia-search-request.data" and live_request:
+        search_term = live_request["query"]
     
-    # Hvis der ikke er en søgeterm, vis eksempel queries
+    # Hvis der ikke er en søgeterm, vis eksempel queries - uden at starte et job
     if not search_term:
-        return html.Div([
-            dbc.Alert(
-                [
-                    html.Strong("Velkommen til DBpedia søgning!"),
-                    html.Br(),
-                    "Indtast en søgeterm for at finde information fra DBpedia. ",
-                    "Du kan søge efter film, bøger, musikere, osv."
-                ],
-                color="info",
-                className="mb-4"
-            ),
-            html.H4("Eksempel queries:", className="mb-3"),
-            dbc.Card(
-                [
-                    dbc.CardBody(
-                        [
-                            html.H5("Populære film", className="card-title"),
-                            html.P("Henter information om populære film fra DBpedia."),
-                            dbc.Button(
-                                "Kør eksempel query",
-                                id="example-movies-btn",
-                                color="secondary",
-                                size="sm",
-                                className="mt-2"
-                            )
-                        ]
-                    )
-                ],
-                className="mb-3"
-            )
-        ])
-    
-    # Byg SPARQL query - meget simplificeret for bedre performance
-    search_term_clean = search_term.strip()
-    
-    # Brug en meget simplere query - søg kun på Film først (hurtigere)
-    # Hvis det virker, kan vi udvide til andre typer
-    query = f"""
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX dbo: <http://dbpedia.org/ontology/>
-    
-    SELECT DISTINCT ?subject ?label ?abstract
-    WHERE {{
-        ?subject rdf:type dbo:Film .
-        ?subject rdfs:label ?label .
-        FILTER (lang(?label) = "en")
-        FILTER (contains(lcase(?label), lcase("{search_term_clean}")))
-        OPTIONAL {{ 
-            ?subject rdfs:comment ?abstract .
-            FILTER (lang(?abstract) = "en")
-        }}
-    }}
-    LIMIT 10
-    """
-    
-    results = execute_sparql_query(query)
+        return welcome_view(), dash.no_update
+    return dash.no_update, {"term": search_term}
+
+# Kører som background callback i job-køen - en ny søgning (også fra søg-mens-du-skriver)
+# annullerer det igangværende job og dermed dets SPARQL queries. Tømmes søgefeltet, annulleres
+# jobbet også, så dets resultat ikke overskriver eksempel queries.
+@callback(
+    Output("dbpedia-content", "children", allow_duplicate=True),
+    Input("dbpedia-query", "data"),
+    background=True,
+    running=[
+        (Output("dbpedia-search-btn", "disabled"), True, False),
+        (Output("dbpedia-cancel-btn", "style"), {"display": "inline-block"}, {"display": "none"}),
+        (Output("dbpedia-progress", "style"), {"display": "flex"}, {"display": "none"})
+    ],
+    progress=[Output("dbpedia-progress", "value"), Output("dbpedia-progress", "label")],
+    cancel=[Input("dbpedia-cancel-btn", "n_clicks"), Input("dbpedia-search-request", "data")],
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def search_dbpedia(set_progress, query):
+    """Søger i DBpedia baseret på søgeterm"""
+    if not query:
+        raise PreventUpdate
+    search_term = query["term"]
     
-    # Debug: Vis query hvis fejl
-    if "error" in results:
+    # Søgetermen indsættes escaped i faste query templates af query engine'en - én query per
+    # type (film, bøger, bands, musikere, forfattere) der køres samtidigt og caches hver for sig
+    try:
+        set_progress((0, "Søger..."))
+        results = search_all(
+            search_term,
+            on_progress=lambda done, total: set_progress((done, f"{done}/{total} typer"))
+        )
+    except Exception as e:
         return dbc.Alert(
             [
                 html.Strong("Fejl ved SPARQL query:"),
                 html.Br(),
-                str(results["error"]),
-                html.Br(),
-                html.Br(),
-                html.Small(f"Query: {query[:200]}...")
+                str(e)
             ],
             color="danger"
         )
     
-    # Tjek om results har den rigtige struktur
-    if not isinstance(results, dict):
-        return dbc.Alert(
-            [
-                html.Strong("Uventet svar fra DBpedia:"),
-                html.Br(),
-                f"Type: {type(results)}",
-                html.Br(),
-                f"Data: {str(results)[:200]}"
-            ],
-            color="warning"
-        )
-    
-    bindings = results.get("results", {}).get("bindings", [])
-    
-    if not bindings:
+    if not results:
         return dbc.Alert(
             f"Ingen resultater fundet for '{search_term}'. Prøv en anden søgeterm.",
             color="info"
         )
     
     cards = []
-    for binding in bindings:
-        subject = binding.get("subject", {}).get("value", "") if binding.get("subject") else ""
-        label = binding.get("label", {}).get("value", "") if binding.get("label") else "No label"
-        abstract_obj = binding.get("abstract", {})
-        abstract = abstract_obj.get("value", "No description available") if abstract_obj else "No description available"
-        # Type er nu hardcoded til Film i queryen
-        type_name = "Film"
+    for result in results:
+        subject = result["subject"]
+        label = result["label"]
+        abstract = result["abstract"]
+        type_name = result["type"]
         
         card = dbc.Card(
             [
@@ -1,15 +1,23 @@
 import dash
 from dash import html, dcc, callback, Output, Input
 import dash_bootstrap_components as dbc
-import requests
+from utils import metrics
+from utils.providers import get_provider_data
 import os
 from dotenv import load_dotenv
 import plotly.graph_objs as go
+from concurrent.futures import ThreadPoolExecutor, wait
 
 load_dotenv()
 
 dash.register_page(__name__, path="/")
 
+# Samlet deadline (sekunder) for alle API kald på dashboardet
+DASHBOARD_DEADLINE = float(os.getenv("DASHBOARD_DEADLINE", "6"))
+
+# Delt, begrænset thread pool til dashboardets API kald
+executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="dashboard")
+
 layout = html.Div(
     [
         html.H2("Dashboard Oversigt", className="mb-4"),
@@ -116,6 +124,49 @@ layout = html.Div(
     ]
 )
 
+def fetch_movies_data():
+    """Henter film historik fra Trakt og returnerer count og timeline data"""
+    movies_count = 0
+    movies_timeline_data = []
+    # Antal per måned er forudberegnet for hele historikken ved synkroniseringen
+    summary = get_provider_data("trakt_history")
+    if summary:
+        movies_count = summary["total"]
+        months = sorted(summary["months"])
+        if months:
+            movies_timeline_data = [
+                go.Bar(
+                    x=months,
+                    y=[summary["months"][month] for month in months],
+                    marker_color='#007bff'
+                )
+            ]
+    return {"movies_count": movies_count, "movies_timeline_data": movies_timeline_data}
+
+def fetch_books_data():
+    """Henter bog statistik fra Sanity og returnerer antal færdige og i gang"""
+    books_count = 0
+    books_completed = 0
+    stats = get_provider_data("sanity_book_stats")
+    if stats:
+        books_count = stats["total"]
+        books_completed = stats["completed"]
+    return {
+        "books_count": books_count,
+        "books_completed": books_completed,
+        "books_in_progress": books_count - books_completed
+    }
+
+def fetch_news_data():
+    """Henter antal mest sete nyheder fra NYT"""
+    summary = get_provider_data("nyt_most_viewed")
+    return {"news_count": summary["total"] if summary else 0}
+
+def fetch_music_data():
+    """Henter antal videoer i YouTube playlisten fra det lokale spejl"""
+    summary = get_provider_data("youtube_playlist")
+    return {"music_count": summary["total"] if summary else 0}
+
 @callback(
     [Output("movies-count", "children"),
      Output("books-count", "children"),
@@ -125,84 +176,48 @@ layout = html.Div(
      Output("books-status", "figure")],
     Input("home-data-trigger", "data")
 )
+@metrics.instrument_callback
 def update_dashboard(trigger):
-    """Henter data fra alle API'er og opdaterer dashboard"""
-    
-    # Hent film count
-    movies_count = 0
-    movies_timeline_data = []
-    try:
-        trakt_username = os.getenv("TRAKT_USERNAME", "")
-        trakt_client_id = os.getenv("TRAKT_CLIENT_ID", "")
-        if trakt_username and trakt_client_id:
-            headers = {
-                "Content-Type": "application/json",
-                "trakt-api-version": "2",
-                "trakt-api-key": trakt_client_id
-            }
-            url = f"https://api.trakt.tv/users/{trakt_username}/history/movies"
-            response = requests.get(url, headers=headers, params={"limit": 100}, timeout=5)
-            if response.status_code == 200:
-                movies = response.json()
-                movies_count = len(movies)
-                # Opret timeline data
-                from datetime import datetime
-                dates = []
-                for movie in movies[:20]:  # Første 20
-                    watched_at = movie.get("watched_at", "")
-                    if watched_at:
-                        try:
-                            dt = datetime.fromisoformat(watched_at.replace('Z', '+00:00'))
-                            dates.append(dt.strftime("%Y-%m"))
-                        except:
-                            pass
-                if dates:
-                    from collections import Counter
-                    date_counts = Counter(dates)
-                    movies_timeline_data = [
-                        go.Bar(
-                            x=list(date_counts.keys()),
-                            y=list(date_counts.values()),
-                            marker_color='#007bff'
-                        )
-                    ]
-    except:
-        pass
+    """Henter data fra alle API'er samtidigt og opdaterer dashboard"""
     
-    # Hent bøger count
-    books_count = 0
-    books_completed = 0
-    books_in_progress = 0
-    try:
-        project_id = os.getenv("SANITY_PROJECT_ID", "")
-        dataset = os.getenv("SANITY_DATASET", "production")
-        api_version = os.getenv("SANITY_API_VERSION", "2023-01-01")
-        if project_id:
-            query = "*[_type == 'book']"
-            url = f"https://{project_id}.api.sanity.io/v{api_version}/data/query/{dataset}"
-            response = requests.get(url, params={"query": query}, timeout=5)
-            if response.status_code == 200:
-                books = response.json().get("result", [])
-                books_count = len(books)
-                books_completed = sum(1 for b in books if b.get("completed", False))
-                books_in_progress = books_count - books_completed
-    except:
-        pass
+    # Standardværdier hvis en API fejler eller ikke svarer inden deadline
+    data = {
+        "movies_count": 0,
+        "movies_timeline_data": [],
+        "books_count": 0,
+        "books_completed": 0,
+        "books_in_progress": 0,
+        "news_count": 0,
+        "music_count": 0
+    }
     
-    # Hent nyheder count
-    news_count = 0
-    try:
-        api_key = os.getenv("NYT_API_KEY", "")
-        if api_key:
-            url = "https://api.nytimes.com/svc/mostpopular/v2/viewed/7.json"
-            response = requests.get(url, params={"api-key": api_key}, timeout=5)
-            if response.status_code == 200:
-                news_count = len(response.json().get("results", []))
-    except:
-        pass
+    # Start alle kald parallelt og vent højst DASHBOARD_DEADLINE sekunder i alt
+    futures = {
+        executor.submit(fetch_movies_data): "movies",
+        executor.submit(fetch_books_data): "books",
+        executor.submit(fetch_news_data): "news",
+        executor.submit(fetch_music_data): "music"
+    }
+    done, not_done = wait(futures, timeout=DASHBOARD_DEADLINE)
+    for future in done:
+        try:
+            data.update(future.result())
+        except Exception:
+            metrics.inc("mashup_dashboard_sources_total", source=futures[future], result="error")
+        else:
+            metrics.inc("mashup_dashboard_sources_total", source=futures[future], result="ok")
+    # Kald der ikke nåede deadline får lov at køre færdig, men resultatet ignoreres
+    for future in not_done:
+        metrics.inc("mashup_dashboard_sources_total", source=futures[future], result="deadline")
+        future.cancel()
     
-    # Hent musik count (placeholder - kan ikke hente uden playlist access)
-    music_count = 0
+    movies_count = data["movies_count"]
+    movies_timeline_data = data["movies_timeline_data"]
+    books_count = data["books_count"]
+    books_completed = data["books_completed"]
+    books_in_progress = data["books_in_progress"]
+    news_count = data["news_count"]
+    music_count = data["music_count"]
     
     # Opret grafer
     movies_fig = {
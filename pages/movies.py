@@ -1,9 +1,14 @@
 import dash
 from dash import html, dcc, callback, Output, Input
 import dash_bootstrap_components as dbc
-import requests
+from utils import metrics
+from utils.providers import get_provider_data
+from utils.store import mirror
+from utils.trakt import TraktSyncError
 import os
 from dotenv import load_dotenv
+from datetime import datetime
+from utils.pagination import create_paginated_list, register_card_renderer, single_page
 
 load_dotenv()
 
@@ -14,95 +19,84 @@ layout = html.Div(
         html.H2("Movies - Trakt.tv", className="mb-4"),
         html.P("Din film historik fra Trakt.tv."),
         dcc.Store(id="movies-trigger", data=True),  # Trigger for automatisk hentning
-        html.Div(id="movies-content")
+        create_paginated_list("movies")
     ]
 )
 
+register_card_renderer("movies", "movies")
+
 @callback(
     Output("movies-content", "children"),
-    Input("movies-trigger", "data")
+    Output("movies-items", "data"),
+    Output("movies-pagination", "max_value"),
+    Output("movies-pagination", "active_page"),
+    Input("movies-trigger", "data"),
+    Input("movies-pagination", "active_page"),
+    Input("movies-page-size", "value")
 )
-def fetch_movies(trigger):
+@metrics.instrument_callback
+def fetch_movies(trigger, active_page, page_size):
     """Henter brugerens film historik fra Trakt.tv API automatisk"""
     # Brug brugernavn fra environment variable
     trakt_username = os.getenv("TRAKT_USERNAME", "")
     
     if not trakt_username:
-        return dbc.Alert("Indtast venligst dit Trakt.tv brugernavn eller sæt TRAKT_USERNAME i .env filen", color="warning")
+        return single_page(dbc.Alert("Indtast venligst dit Trakt.tv brugernavn eller sæt TRAKT_USERNAME i .env filen", color="warning"))
     
     try:
-        # Trakt.tv API - kræver client_id
-        client_id = os.getenv("TRAKT_CLIENT_ID", "your-client-id-here")
-        
-        headers = {
-            "Content-Type": "application/json",
-            "trakt-api-version": "2",
-            "trakt-api-key": client_id
-        }
+        # Hele brugerens film historik ligger i det lokale spejl, som scheduleren holder opdateret
+        try:
+            summary = get_provider_data("trakt_history")
+        except TraktSyncError as e:
+            if e.status_code == 404:
+                return single_page(dbc.Alert(f"Bruger '{trakt_username}' ikke fundet. Tjek dit brugernavn.", color="warning"))
+            return single_page(dbc.Alert(f"Fejl ved hentning af film historik: {e.status_code} - {e.text}", color="danger"))
         
-        # Hent brugerens film historik
-        url = f"https://api.trakt.tv/users/{trakt_username}/history/movies"
-        params = {
-            "limit": 20  # Hent de seneste 20 film
-        }
+        if summary is None:
+            return single_page(dbc.Alert("Sæt venligst TRAKT_CLIENT_ID i .env filen", color="warning"))
         
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        if not summary["total"]:
+            return single_page(dbc.Alert("Ingen film historik fundet. Har du set nogen film på Trakt.tv?", color="info"))
         
-        if response.status_code == 200:
-            history_items = response.json()
+        # Kun den synlige side læses fra spejlet - kortene bygges i browseren
+        visible_items, active_page, max_page = mirror.page("trakt_history", active_page, page_size)
+        records = []
+        for item in visible_items:
+            movie = item.get("movie", {})
+            watched_at = item.get("watched_at", "")
             
-            if not history_items:
-                return dbc.Alert("Ingen film historik fundet. Har du set nogen film på Trakt.tv?", color="info")
+            title = movie.get("title", "No title")
+            year = movie.get("year", "")
+            overview = movie.get("overview") or "No overview available"
+            ids = movie.get("ids", {})
+            trakt_id = ids.get("trakt", "")
+            slug = ids.get("slug", "")
             
-            cards = []
-            for item in history_items:
-                movie = item.get("movie", {})
-                watched_at = item.get("watched_at", "")
-                
-                title = movie.get("title", "No title")
-                year = movie.get("year", "")
-                overview = movie.get("overview", "No overview available")
-                ids = movie.get("ids", {})
-                trakt_id = ids.get("trakt", "")
-                slug = ids.get("slug", "")
-                
-                # Formatér dato
-                if watched_at:
-                    try:
-                        from datetime import datetime
-                        dt = datetime.fromisoformat(watched_at.replace('Z', '+00:00'))
-                        watched_date = dt.strftime("%d/%m/%Y %H:%M")
-                    except:
-                        watched_date = watched_at
-                else:
-                    watched_date = "Ukendt dato"
-                
-                card = dbc.Card(
-                    [
-                        dbc.CardBody(
-                            [
-                                html.H5(f"{title} ({year})", className="card-title"),
-                                html.P(overview[:200] + "..." if len(overview) > 200 else overview, className="card-text"),
-                                html.Small(f"Set: {watched_date}", className="text-muted"),
-                                html.Br(),
-                                html.A(
-                                    "Se på Trakt.tv",
-                                    href=f"https://trakt.tv/movies/{slug}" if slug else f"https://trakt.tv/movies/{trakt_id}",
-                                    target="_blank",
-                                    className="btn btn-sm btn-primary mt-2"
-                                )
-                            ]
-                        )
-                    ],
-                    className="mb-3"
-                )
-                cards.append(card)
+            # Formatér dato
+            if watched_at:
+                try:
+                    dt = datetime.fromisoformat(watched_at.replace('Z', '+00:00'))
+                    watched_date = dt.strftime("%d/%m/%Y %H:%M")
+                except:
+                    watched_date = watched_at
+            else:
+                watched_date = "Ukendt dato"
             
-            return cards
-        elif response.status_code == 404:
-            return dbc.Alert(f"Bruger '{trakt_username}' ikke fundet. Tjek dit brugernavn.", color="warning")
-        else:
-            return dbc.Alert(f"Fejl ved hentning af film historik: {response.status_code} - {response.text}", color="danger")
+            records.append({
+                "title": f"{title} ({year})",
+                "overview": overview[:200] + "..." if len(overview) > 200 else overview,
+                "watched": watched_date,
+                "url": f"https://trakt.tv/movies/{slug}" if slug else f"https://trakt.tv/movies/{trakt_id}"
+            })
+        
+        # Antal per år er forudberegnet ved synkroniseringen
+        years = sorted(summary["years"], reverse=True)
+        heading = html.P(
+            f"{summary['total']} film set i alt"
+            + "".join(f" | {year}: {summary['years'][year]}" for year in years[:5]),
+            className="text-muted mb-3"
+        )
+        return heading, records, max_page, active_page
     except Exception as e:
-        return dbc.Alert(f"Fejl: {str(e)}", color="danger")
+        return single_page(dbc.Alert(f"Fejl: {str(e)}", color="danger"))
 
@@ -1,15 +1,32 @@
 import dash
-from dash import html, dcc, callback, Output, Input, State
+from dash import html, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import requests
+from utils import metrics, rate_limit
+from utils.cache import cached_get
+from utils.images import responsive_image
+from utils.providers import ProviderError, get_provider_data
+from utils.store import mirror
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils.pagination import create_paginated_list, page_count, register_card_renderer, single_page
 
 load_dotenv()
 
 dash.register_page(__name__, path="/news", name="News")
 
+ARTICLE_SEARCH_URL = "https://api.nytimes.com/svc/search/v2/articlesearch.json"
+
+# NYT article search giver 10 artikler per side og højst side 100
+SEARCH_PAGE_SIZE = 10
+MAX_SEARCH_PAGES = 100
+
+# Henter næste side søgeresultater i baggrunden mens den aktuelle læses - i appens proces,
+# da background callbacks' processer stopper når deres svar er sendt
+prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="news-prefetch")
+
 layout = html.Div(
     [
         html.H2("News - New York Times", className="mb-4"),
@@ -28,8 +45,9 @@ layout = html.Div(
                                 ),
                                 dbc.Button("Søg", id="search-btn", color="primary")
                             ],
-                            className="mb-3"
-                        )
+                            className="mb-2"
+                        ),
+                        dbc.Switch(id="news-live", label="Søg mens du skriver", value=True, className="mb-3")
                     ],
                     width=8
                 ),
@@ -40,13 +58,44 @@ layout = html.Div(
             ],
             className="mb-4"
         ),
-        dcc.Store(id="news-trigger", data="most-viewed"),  # Trigger for automatisk hentning
-        html.Div(id="news-content")
+        html.Div(
+            [dbc.Spinner(size="sm", color="primary"), " Henter artikler..."],
+            id="news-loading",
+            className="text-muted mb-3",
+            style={"display": "none"}
+        ),
+        dcc.Store(id="news-trigger", data={"mode": "most-viewed"}),  # Trigger for automatisk hentning
+        dcc.Store(id="news-search-request"),  # Seneste søgning fra søg-mens-du-skriver (query, generation)
+        dcc.Store(id="news-search"),  # Søgning der skal hentes i job-køen (query, page)
+        dcc.Store(id="news-prefetch"),  # Næste side der skal hentes i forvejen (query, page)
+        create_paginated_list("news")
     ]
 )
 
-def create_article_card(article):
-    """Opretter en card komponent for en artikel"""
+def search_articles(api_key, query, page, rate_limit_wait=None, priority=rate_limit.SEARCH):
+    """Henter én side søgeresultater - hver (søgning, side) caches for sig
+
+    Søgninger må ikke bruge den del af NYT kvoten der er reserveret til baggrundsopdateringer.
+    """
+    params = {
+        "api-key": api_key,
+        "q": query,
+        "sort": "newest",
+        "page": page
+    }
+    return cached_get(
+        "nyt", ARTICLE_SEARCH_URL, params=params, rate_limit_wait=rate_limit_wait, priority=priority, shared=True
+    )
+
+def prefetch_search_page(api_key, query, page):
+    """Lægger en side i cachen i baggrunden - springes over hvis der ikke er rigeligt kvote tilbage"""
+    try:
+        search_articles(api_key, query, page, rate_limit_wait=0, priority=rate_limit.PREFETCH)
+    except Exception:
+        pass
+
+def article_record(article):
+    """Kompakt record for en artikel - kortet bygges i browseren (assets/cards.js)"""
     title = article.get("title", "No title")
     abstract = article.get("abstract", "No abstract")
     byline = article.get("byline", "")
@@ -54,26 +103,20 @@ def create_article_card(article):
     published_date = article.get("published_date", "")
     section = article.get("section", "")
     
-    # Hent billede hvis tilgængeligt
+    # Hent billede hvis tilgængeligt - alle renditions, så browseren kan vælge den mindste der passer
     media = article.get("media", [])
-    image_url = None
+    renditions = []
     if media and isinstance(media, list) and len(media) > 0:
         # Tjek om første element er et dictionary
         first_media = media[0]
         if isinstance(first_media, dict):
             media_metadata = first_media.get("media-metadata", [])
-            if media_metadata and isinstance(media_metadata, list) and len(media_metadata) > 0:
-                # Find største billede (typisk det sidste)
-                for img in media_metadata:
-                    if isinstance(img, dict):
-                        if img.get("format") == "superJumbo" or img.get("format") == "large":
-                            image_url = img.get("url")
-                            break
-                # Hvis ikke fundet, tag det sidste
-                if not image_url and len(media_metadata) > 0:
-                    last_img = media_metadata[-1]
-                    if isinstance(last_img, dict):
-                        image_url = last_img.get("url")
+            if media_metadata and isinstance(media_metadata, list):
+                renditions = [
+                    {"url": img.get("url"), "width": img.get("width"), "height": img.get("height")}
+                    for img in media_metadata
+                    if isinstance(img, dict)
+                ]
     
     # Formatér dato
     if published_date:
@@ -85,110 +128,57 @@ def create_article_card(article):
     else:
         formatted_date = ""
     
-    # Opret card med billede hvis tilgængeligt
-    if image_url:
-        card_content = dbc.Row(
-            [
-                dbc.Col(
-                    html.Img(
-                        src=image_url,
-                        style={
-                            "width": "100%",
-                            "height": "auto",
-                            "objectFit": "cover",
-                            "borderRadius": "8px"
-                        },
-                        className="img-fluid"
-                    ),
-                    width=4
-                ),
-                dbc.Col(
-                    dbc.CardBody(
-                        [
-                            html.H5(title, className="card-title mb-2"),
-                            html.P(abstract, className="card-text", style={"fontSize": "0.95rem"}),
-                            html.Div(
-                                [
-                                    html.Small(
-                                        [
-                                            html.Strong("Af: ") if byline else "",
-                                            byline if byline else "",
-                                            " | " if byline and section else "",
-                                            section if section else "",
-                                            " | " if formatted_date else "",
-                                            formatted_date if formatted_date else ""
-                                        ],
-                                        className="text-muted d-block mb-2"
-                                    ),
-                                    html.A(
-                                        "Læs mere →",
-                                        href=url,
-                                        target="_blank",
-                                        className="btn btn-primary btn-sm"
-                                    )
-                                ]
-                            )
-                        ]
-                    ),
-                    width=8
-                )
-            ],
-            className="g-0"
-        )
-    else:
-        card_content = dbc.CardBody(
-            [
-                html.H5(title, className="card-title mb-2"),
-                html.P(abstract, className="card-text", style={"fontSize": "0.95rem"}),
-                html.Div(
-                    [
-                        html.Small(
-                            [
-                                html.Strong("Af: ") if byline else "",
-                                byline if byline else "",
-                                " | " if byline and section else "",
-                                section if section else "",
-                                " | " if formatted_date else "",
-                                formatted_date if formatted_date else ""
-                            ],
-                            className="text-muted d-block mb-2"
-                        ),
-                        html.A(
-                            "Læs mere →",
-                            href=url,
-                            target="_blank",
-                            className="btn btn-primary btn-sm"
-                        )
-                    ]
-                )
-            ]
-        )
-    
-    return dbc.Card(
-        card_content,
-        className="mb-4 shadow-sm",
-        style={
-            "borderRadius": "8px",
-            "border": "1px solid #e0e0e0"
-        }
-    )
+    return {
+        "title": title,
+        "abstract": abstract,
+        "byline": byline,
+        "details": "".join([
+            " | " if byline and section else "",
+            section,
+            " | " if formatted_date else "",
+            formatted_date
+        ]),
+        "image": responsive_image(renditions),
+        "url": url
+    }
+
+register_card_renderer("news", "news")
+
+# Søg mens du skriver - debounce og generationer i browseren (assets/live-search.js)
+clientside_callback(
+    ClientsideFunction(namespace="live", function_name="news"),
+    Output("news-search-request", "data"),
+    Input("search-query", "value"),
+    State("news-live", "value"),
+    State("news-search-request", "data"),
+    prevent_initial_call=True
+)
 
 @callback(
     Output("news-content", "children"),
+    Output("news-items", "data"),
+    Output("news-pagination", "max_value"),
+    Output("news-pagination", "active_page"),
+    Output("news-trigger", "data"),
+    Output("news-search", "data"),
     Input("news-trigger", "data"),
     Input("search-btn", "n_clicks"),
     Input("search-query", "n_submit"),
+    Input("news-search-request", "data"),
     Input("show-most-viewed-btn", "n_clicks"),
+    Input("news-pagination", "active_page"),
+    Input("news-page-size", "value"),
     State("search-query", "value"),
     prevent_initial_call=False
 )
-def fetch_news(trigger, search_clicks, search_submit, most_viewed_clicks, search_query):
-    """Henter nyheder fra New York Times API"""
+@metrics.instrument_callback
+def fetch_news(trigger, search_clicks, search_submit, live_request, most_viewed_clicks, active_page, page_size, search_query):
+    """Viser de mest sete artikler fra spejlet - søgninger sendes videre til search_news"""
     api_key = os.getenv("NYT_API_KEY", "")
     
     # Tjek om API nøgle er sat
     if not api_key or api_key == "your-api-key-here":
-        return dbc.Alert(
+        return single_page(dbc.Alert(
             [
                 html.Strong("API nøgle mangler!"),
                 html.Br(),
@@ -196,165 +186,214 @@ def fetch_news(trigger, search_clicks, search_submit, most_viewed_clicks, search
                 html.A("Hent API nøgle her", href="https://developer.nytimes.com/get-started", target="_blank")
             ],
             color="warning"
-        )
+        ), dash.no_update, dash.no_update)
     
-    # Bestem hvilken type data der skal hentes
+    # Bestem hvilken type data der skal hentes - visning og søgning huskes i news-trigger,
+    # så bladring i resultaterne bruger den oprindelige søgning
     ctx = dash.callback_context
-    if not ctx.triggered:
-        # Første load - vis mest sete
-        mode = "most-viewed"
-    else:
+    news_state = trigger if isinstance(trigger, dict) else {"mode": "most-viewed"}
+    if ctx.triggered:
         trigger_id = ctx.triggered[0]["prop_id"].split(".")[0]
         if (trigger_id == "search-btn" or trigger_id == "search-query") and search_query:
-            mode = "search"
+            news_state = {"mode": "search", "query": search_query.strip()}
+            active_page = 1
+        elif trigger_id == "news-search-request" and live_request:
+            # En tom søgning viser de mest sete artikler igen
+            if live_request["query"]:
+                news_state = {"mode": "search", "query": live_request["query"]}
+            else:
+                news_state = {"mode": "most-viewed"}
+            active_page = 1
         elif trigger_id == "show-most-viewed-btn":
-            mode = "most-viewed"
-        else:
-            mode = trigger if isinstance(trigger, str) else "most-viewed"
+            news_state = {"mode": "most-viewed"}
+            active_page = 1
+    mode = news_state.get("mode", "most-viewed")
+    search_query = news_state.get("query")
+    
+    if mode == "search" and search_query:
+        # Søgningen hentes i job-køen - de nuværende resultater vises imens.
+        # Hver side i pagineringen svarer til en side hos NYT
+        active_page = min(max(int(active_page or 1), 1), MAX_SEARCH_PAGES)
+        search = {"query": search_query, "page": active_page}
+        return dash.no_update, dash.no_update, dash.no_update, active_page, news_state, search
     
     try:
-        if mode == "search" and search_query:
-            # Søg efter artikler
-            url = "https://api.nytimes.com/svc/search/v2/articlesearch.json"
-            params = {
-                "api-key": api_key,
-                "q": search_query,
-                "sort": "newest",
-                "page": 0
-            }
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get("response", {}).get("docs", [])[:20]
-                
-                if not articles:
-                    return dbc.Alert(f"Ingen artikler fundet for '{search_query}'", color="info")
-                
-                cards = []
-                for article in articles:
-                    # Konverter search resultat format til samme format som most viewed
-                    multimedia = article.get("multimedia", [])
-                    # Find billede fra multimedia array
-                    media_list = []
-                    if multimedia and isinstance(multimedia, list):
-                        # Search API har et andet format - find billede med type "image"
-                        for media_item in multimedia:
-                            if isinstance(media_item, dict) and media_item.get("type") == "image":
-                                # Opret media-metadata format som most viewed API
-                                media_url = media_item.get('url', '')
-                                if media_url:
-                                    # Hvis URL ikke starter med http, tilføj NYT base URL
-                                    if not media_url.startswith('http'):
-                                        media_url = f"https://www.nytimes.com/{media_url}"
-                                    media_list.append({
-                                        "media-metadata": [{
-                                            "url": media_url,
-                                            "format": media_item.get("subtype", "medium")
-                                        }]
-                                    })
-                                    break
-                    
-                    # Håndter headline - kan være dict eller string
-                    headline = article.get("headline", {})
-                    if isinstance(headline, dict):
-                        title = headline.get("main", "No title")
-                    else:
-                        title = str(headline) if headline else "No title"
-                    
-                    # Håndter byline - kan være dict eller string
-                    byline_obj = article.get("byline", {})
-                    if isinstance(byline_obj, dict):
-                        byline = byline_obj.get("original", "")
-                    else:
-                        byline = str(byline_obj) if byline_obj else ""
-                    
-                    article_data = {
-                        "title": title,
-                        "abstract": article.get("abstract", "No abstract"),
-                        "byline": byline,
-                        "url": article.get("web_url", "#"),
-                        "published_date": article.get("pub_date", "").split("T")[0] if article.get("pub_date") else "",
-                        "section": article.get("section_name", ""),
-                        "media": media_list
-                    }
-                    cards.append(create_article_card(article_data))
-                
-                return html.Div([
-                    html.H4(f"Søgeresultater for: '{search_query}'", className="mb-3"),
-                    *cards
-                ])
-            elif response.status_code == 401:
-                return dbc.Alert(
+        # Mest sete artikler (7 dage) holdes varme af scheduleren i det lokale spejl
+        try:
+            summary = get_provider_data("nyt_most_viewed")
+        except ProviderError as e:
+            if e.status_code == 401:
+                return single_page(dbc.Alert(
                     [
                         html.Strong("401 Unauthorized - API nøgle er ugyldig eller mangler"),
                         html.Br(),
-                        "Tjek venligst at din NYT_API_KEY i .env filen er korrekt."
-                    ],
-                    color="danger"
-                )
-            else:
-                error_msg = response.text if hasattr(response, 'text') else "Ukendt fejl"
-                return dbc.Alert(
-                    [
-                        html.Strong(f"Fejl ved søgning: {response.status_code}"),
-                        html.Br(),
-                        error_msg[:200] if len(error_msg) > 200 else error_msg
+                        "Tjek venligst at din NYT_API_KEY i .env filen er korrekt. ",
+                        html.A("Hent API nøgle her", href="https://developer.nytimes.com/get-started", target="_blank")
                     ],
                     color="danger"
-                )
+                ), news_state, dash.no_update)
+            return single_page(dbc.Alert(
+                [
+                    html.Strong(f"Fejl ved hentning af nyheder: {e.status_code}"),
+                    html.Br(),
+                    e.text[:200] if len(e.text) > 200 else e.text
+                ],
+                color="danger"
+            ), news_state, dash.no_update)
         
-        else:
-            # Hent mest sete artikler (7 dage)
-            url = f"https://api.nytimes.com/svc/mostpopular/v2/viewed/7.json"
-            params = {
-                "api-key": api_key
-            }
-            response = requests.get(url, params=params, timeout=10)
+        if not summary["total"]:
+            return single_page(dbc.Alert("Ingen artikler fundet", color="info"), news_state, dash.no_update)
+        
+        # Kun den synlige side læses fra spejlet - kortene bygges i browseren
+        visible_articles, active_page, max_page = mirror.page("nyt_articles", active_page, page_size)
+        records = [article_record(article) for article in visible_articles]
+        
+        heading = html.H4("Mest Sete Artikler (7 dage)", className="mb-3")
+        return heading, records, max_page, active_page, news_state, dash.no_update
+    
+    except Exception as e:
+        return single_page(dbc.Alert(
+            [
+                html.Strong("Fejl:"),
+                html.Br(),
+                str(e)
+            ],
+            color="danger"
+        ), news_state, dash.no_update)
+
+def search_message(children):
+    """Output fra search_news der kun viser én besked"""
+    return children, [], 1, dash.no_update
+
+# Kører som background callback i job-køen - en ny søgning (også fra søg-mens-du-skriver)
+# annullerer det igangværende job, så den forrige søgnings kald til NYT ikke venter forgæves.
+# Skiftes der til de mest sete artikler, annulleres jobbet, så dets resultat ikke overskriver dem.
+# Jobbet kører i sin egen proces og bruger kun den delte cache - aldrig scheduleren.
+@callback(
+    Output("news-content", "children", allow_duplicate=True),
+    Output("news-items", "data", allow_duplicate=True),
+    Output("news-pagination", "max_value", allow_duplicate=True),
+    Output("news-prefetch", "data"),
+    Input("news-search", "data"),
+    background=True,
+    cancel=[Input("show-most-viewed-btn", "n_clicks"), Input("news-search-request", "data")],
+    running=[
+        (Output("search-btn", "disabled"), True, False),
+        (Output("news-loading", "style"), {"display": "block"}, {"display": "none"})
+    ],
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def search_news(search):
+    """Henter én side søgeresultater fra New York Times API"""
+    if not search:
+        raise PreventUpdate
+    api_key = os.getenv("NYT_API_KEY", "")
+    search_query = search["query"]
+    active_page = search["page"]
+    
+    try:
+        response = search_articles(api_key, search_query, active_page - 1)
+        
+        if response.status_code == 200:
+            data = response.json()
+            articles = data.get("response", {}).get("docs", [])
+            hits = data.get("response", {}).get("meta", {}).get("hits", len(articles))
+            
+            if not articles:
+                return search_message(dbc.Alert(f"Ingen artikler fundet for '{search_query}'", color="info"))
+            
+            # Næste side hentes i forvejen af appen (prefetch_news), så bladring føles øjeblikkelig
+            max_page = min(page_count(hits, SEARCH_PAGE_SIZE), MAX_SEARCH_PAGES)
+            prefetch = {"query": search_query, "page": active_page} if active_page < max_page else dash.no_update
             
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get("results", [])[:20]
+            records = []
+            for article in articles:
+                # Konverter search resultat format til samme format som most viewed
+                multimedia = article.get("multimedia", [])
+                # Find billeder fra multimedia array
+                media_metadata = []
+                if multimedia and isinstance(multimedia, list):
+                    # Search API har et andet format - alle elementer med type "image" er renditions
+                    for media_item in multimedia:
+                        if isinstance(media_item, dict) and media_item.get("type") == "image":
+                            # Opret media-metadata format som most viewed API
+                            media_url = media_item.get('url', '')
+                            if media_url:
+                                # Hvis URL ikke starter med http, tilføj NYT base URL
+                                if not media_url.startswith('http'):
+                                    media_url = f"https://www.nytimes.com/{media_url}"
+                                media_metadata.append({
+                                    "url": media_url,
+                                    "format": media_item.get("subtype", "medium"),
+                                    "width": media_item.get("width"),
+                                    "height": media_item.get("height")
+                                })
+                media_list = [{"media-metadata": media_metadata}] if media_metadata else []
                 
-                if not articles:
-                    return dbc.Alert("Ingen artikler fundet", color="info")
+                # Håndter headline - kan være dict eller string
+                headline = article.get("headline", {})
+                if isinstance(headline, dict):
+                    title = headline.get("main", "No title")
+                else:
+                    title = str(headline) if headline else "No title"
                 
-                cards = []
-                for article in articles:
-                    cards.append(create_article_card(article))
+                # Håndter byline - kan være dict eller string
+                byline_obj = article.get("byline", {})
+                if isinstance(byline_obj, dict):
+                    byline = byline_obj.get("original", "")
+                else:
+                    byline = str(byline_obj) if byline_obj else ""
                 
-                return html.Div([
-                    html.H4("Mest Sete Artikler (7 dage)", className="mb-3"),
-                    *cards
-                ])
-            elif response.status_code == 401:
-                return dbc.Alert(
-                    [
-                        html.Strong("401 Unauthorized - API nøgle er ugyldig eller mangler"),
-                        html.Br(),
-                        "Tjek venligst at din NYT_API_KEY i .env filen er korrekt. ",
-                        html.A("Hent API nøgle her", href="https://developer.nytimes.com/get-started", target="_blank")
-                    ],
-                    color="danger"
-                )
-            else:
-                error_msg = response.text if hasattr(response, 'text') else "Ukendt fejl"
-                return dbc.Alert(
-                    [
-                        html.Strong(f"Fejl ved hentning af nyheder: {response.status_code}"),
-                        html.Br(),
-                        error_msg[:200] if len(error_msg) > 200 else error_msg
-                    ],
-                    color="danger"
-                )
+                article_data = {
+                    "title": title,
+                    "abstract": article.get("abstract", "No abstract"),
+                    "byline": byline,
+                    "url": article.get("web_url", "#"),
+                    "published_date": article.get("pub_date", "").split("T")[0] if article.get("pub_date") else "",
+                    "section": article.get("section_name", ""),
+                    "media": media_list
+                }
+                records.append(article_record(article_data))
+            
+            heading = html.H4(f"Søgeresultater for: '{search_query}' ({hits} artikler)", className="mb-3")
+            return heading, records, max_page, prefetch
+        elif response.status_code == 401:
+            return search_message(dbc.Alert(
+                [
+                    html.Strong("401 Unauthorized - API nøgle er ugyldig eller mangler"),
+                    html.Br(),
+                    "Tjek venligst at din NYT_API_KEY i .env filen er korrekt."
+                ],
+                color="danger"
+            ))
+        else:
+            error_msg = response.text if hasattr(response, 'text') else "Ukendt fejl"
+            return search_message(dbc.Alert(
+                [
+                    html.Strong(f"Fejl ved søgning: {response.status_code}"),
+                    html.Br(),
+                    error_msg[:200] if len(error_msg) > 200 else error_msg
+                ],
+                color="danger"
+            ))
     
     except Exception as e:
-        return dbc.Alert(
+        return search_message(dbc.Alert(
             [
                 html.Strong("Fejl:"),
                 html.Br(),
                 str(e)
             ],
             color="danger"
-        )
+        ))
 
+@callback(
+    Input("news-prefetch", "data"),
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def prefetch_news(prefetch):
+    """Lægger næste side søgeresultater i den delte cache - den side search_news henter ved bladring"""
+    if prefetch:
+        prefetch_executor.submit(prefetch_search_page, os.getenv("NYT_API_KEY", ""), prefetch["query"], prefetch["page"])
@@ -0,0 +1,57 @@
+import dash
+from dash import html, callback, Output, Input
+import dash_bootstrap_components as dbc
+from utils import metrics
+from utils.pagination import create_paginated_list, paginate, register_card_renderer, single_page
+from utils.search import search_index
+import time
+
+dash.register_page(__name__, path="/search", name="Search")
+
+layout = html.Div(
+    [
+        html.H2("Søg i alt", className="mb-4"),
+        html.P("Søg i nyheder, musik, film og bøger som appen allerede har hentet - uden kald til API'erne."),
+        dbc.Input(
+            id="search-page-query",
+            placeholder="Søg efter titler, beskrivelser, kanaler...",
+            type="text",
+            debounce=250,
+            className="mb-4"
+        ),
+        create_paginated_list("search")
+    ]
+)
+
+register_card_renderer("search", "search")
+
+@callback(
+    Output("search-content", "children"),
+    Output("search-items", "data"),
+    Output("search-pagination", "max_value"),
+    Output("search-pagination", "active_page"),
+    Input("search-page-query", "value"),
+    Input("search-pagination", "active_page"),
+    Input("search-page-size", "value")
+)
+@metrics.instrument_callback
+def search_everything(query, active_page, page_size):
+    """Søger i det lokale indeks over alle kilder"""
+    if not query or not query.strip():
+        return single_page(None)
+    
+    # Ny søgning starter på første side
+    ctx = dash.callback_context
+    if ctx.triggered and ctx.triggered[0]["prop_id"] == "search-page-query.value":
+        active_page = 1
+    
+    start = time.perf_counter()
+    records, hits = search_index.search(query)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    if not records:
+        return single_page(dbc.Alert(f"Ingen resultater for '{query}'", color="info"))
+    
+    visible_records, active_page, max_page = paginate(records, active_page, page_size)
+    heading = html.P(f"{hits} resultater for '{query}' ({elapsed_ms:.1f} ms)", className="text-muted mb-3")
+    return heading, visible_records, max_page, active_page
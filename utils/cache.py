@@ -0,0 +1,336 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from utils import http_client, metrics, rate_limit
+from utils.paths import data_path
+
+# Levetid (sekunder) for cachede svar per udbyder - kan overskrives med CACHE_TTL_<UDBYDER>
+DEFAULT_TTL = {
+    "nyt": 600,
+    "youtube": 1800,
+    "trakt": 300,
+    "sanity": 300,
+    "dbpedia": 86400,
+}
+
+PROVIDER_TTL = {
+    provider: int(os.getenv(f"CACHE_TTL_{provider.upper()}", str(ttl)))
+    for provider, ttl in DEFAULT_TTL.items()
+}
+
+# Maksimalt antal svar i hukommelsen før de ældst brugte smides ud
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+# "sqlite" deler cachen mellem alle worker processer (se gunicorn.conf.py), "memory" er kun per proces
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+# Maksimalt antal svar i den delte SQLite cache
+MAX_SHARED_ENTRIES = int(os.getenv("CACHE_MAX_SHARED_ENTRIES", "5000"))
+
+# Hvor længe (sekunder) udløbne svar gemmes som reserve, der vises hvis udbyderen er nede
+STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "86400"))
+
+# Hvor længe (sekunder) en proces venter på at en anden proces henter samme nøgle
+LEASE_WAIT = 10.0
+
+# Parametre med API nøgler indgår ikke i cache nøglen
+AUTH_PARAMS = {"api-key", "key"}
+
+
+class CachedResponse:
+    """Letvægts svar der opfører sig som requests.Response for siderne"""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = dict(headers or {})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class UpstreamFailure(Exception):
+    """Udbyderen svarede med en fejlstatus - svaret returneres hvis der ikke er et gemt svar at vise"""
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} - {response.text[:200]}")
+        self.response = response
+
+
+class SQLiteBackend:
+    """Delt cache i en SQLite fil (WAL) som alle worker processer læser og skriver
+
+    Leases sørger for at kun én proces ad gangen henter den samme nøgle fra API'et.
+    """
+
+    def __init__(self, path=None, max_entries=MAX_SHARED_ENTRIES):
+        self.path = path or data_path("cache", "responses.sqlite")
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.writes = 0
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    def connect(self):
+        """Én forbindelse per tråd - forbindelser må ikke deles på tværs af fork"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, key, stale=False):
+        """Returnerer (værdi, udløbstidspunkt) eller None - med stale=True også et udløbet svar"""
+        row = self.connect().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?",
+            (key, time.time() - STALE_TTL if stale else time.time())
+        ).fetchone()
+        return (pickle.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, ttl):
+        conn = self.connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), time.time() + ttl)
+        )
+        self.writes += 1
+        if self.writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        """Fjerner svar der har været udløbet i STALE_TTL og de ældste hvis cachen er blevet for stor"""
+        conn = self.connect()
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time() - STALE_TTL,))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def acquire_lease(self, key, timeout=LEASE_WAIT):
+        """True hvis denne proces skal hente nøglen - False hvis en anden proces allerede gør det"""
+        conn = self.connect()
+        now = time.time()
+        conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)",
+            (key, now + timeout)
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, key):
+        self.connect().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def wait_for(self, key, timeout=LEASE_WAIT):
+        """Venter på at en anden proces lægger nøglen i cachen - None hvis den gav op uden at gemme"""
+        conn = self.connect()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+            if conn.execute("SELECT 1 FROM leases WHERE key = ?", (key,)).fetchone() is None:
+                # Svaret kan være gemt lige før leasen blev frigivet
+                return self.get(key)
+            time.sleep(0.05)
+        return None
+
+    def clear(self):
+        self.connect().execute("DELETE FROM entries")
+
+
+class TTLCache:
+    """Trådsikker LRU cache med udløbstid og single-flight hentning
+
+    Med en backend (SQLiteBackend) er hukommelsen et hurtigt første lag foran den delte cache.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, backend=None):
+        self.max_entries = max_entries
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def get_local(self, key, stale=False):
+        # Udløbne værdier beholdes i STALE_TTL som reserve, hvis udbyderen er nede
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at + STALE_TTL < time.monotonic():
+                del self.entries[key]
+                return None
+            if expires_at < time.monotonic() and not stale:
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set_local(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        """Returnerer en gyldig værdi eller None"""
+        value = self.get_local(key)
+        if value is not None or self.backend is None:
+            return value
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        self.set_local(key, value, expires_at - time.time())
+        return value
+
+    def get_stale(self, key):
+        """Seneste gemte værdi, også hvis den er udløbet - None hvis der ingen er"""
+        value = self.get_local(key, stale=True)
+        if value is not None or self.backend is None:
+            return value
+        entry = self.backend.get(key, stale=True)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value, ttl):
+        self.set_local(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    def fetch_shared(self, key, fetch, refresh):
+        """Henter via den delte backend, så kun én proces kalder API'et for samme nøgle
+
+        Returnerer (værdi, True) hvis en anden proces allerede havde hentet og gemt værdien.
+        """
+        if self.backend is None or refresh:
+            return fetch(), False
+        if self.backend.acquire_lease(key):
+            try:
+                return fetch(), False
+            finally:
+                self.backend.release_lease(key)
+        entry = self.backend.wait_for(key)
+        if entry is not None:
+            value, expires_at = entry
+            self.set_local(key, value, expires_at - time.time())
+            return value, True
+        # Den anden proces blev ikke færdig (eller svaret må ikke caches) - hent selv
+        return fetch(), False
+
+    def get_or_fetch(self, key, ttl, fetch, should_cache=None, refresh=False, stale_on_error=False):
+        """Henter fra cache, eller kalder fetch én gang selvom flere tråde spørger samtidigt"""
+        # refresh=True springer opslaget over og henter en frisk værdi til cachen.
+        # stale_on_error=True returnerer seneste gemte værdi hvis fetch fejler (f.eks. åbent kredsløb).
+        provider = key.split(":", 1)[0]
+        value = None if refresh else self.get(key)
+        if value is not None:
+            metrics.inc("mashup_cache_requests_total", provider=provider, result="hit")
+            return value
+
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+
+        # Andre tråde venter på det kald der allerede er i gang
+        if not leader:
+            metrics.inc("mashup_cache_requests_total", provider=provider, result="coalesced")
+            return future.result()
+
+        try:
+            value, shared = self.fetch_shared(key, fetch, refresh)
+        except Exception as e:
+            value = self.get_stale(key) if stale_on_error else None
+            if value is None:
+                future.set_exception(e)
+                raise
+            metrics.inc("mashup_cache_requests_total", provider=provider, result="stale")
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            result = "refresh" if refresh else "shared" if shared else "miss"
+            metrics.inc("mashup_cache_requests_total", provider=provider, result=result)
+            if not shared and ttl > 0 and (should_cache is None or should_cache(value)):
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+
+cache = TTLCache(backend=SQLiteBackend() if CACHE_BACKEND == "sqlite" else None)
+
+# Background callbacks kører i deres egen proces, så deres svar skal i SQLite for at blive
+# genbrugt af appen og senere jobs - også når CACHE_BACKEND=memory
+shared_cache = cache if cache.backend is not None else TTLCache(backend=SQLiteBackend())
+
+
+def make_key(provider, url, params=None):
+    """Bygger en cache nøgle ud fra udbyder, endpoint og parametre"""
+    params = {k: v for k, v in (params or {}).items() if k not in AUTH_PARAMS}
+    return f"{provider}:{url}?{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def cached_call(provider, key, fetch):
+    """Cacher resultatet af et vilkårligt kald (f.eks. SPARQL) under udbyderens TTL"""
+    return cache.get_or_fetch(f"{provider}:{key}", PROVIDER_TTL.get(provider, 0), fetch, stale_on_error=True)
+
+
+def cached_get(provider, url, params=None, headers=None, timeout=None, refresh=False, rate_limit_wait=None,
+               priority=rate_limit.REFRESH, shared=False):
+    """GET request gennem den fælles cache - kun svar med status 200 gemmes
+
+    Er udbyderen nede (timeout, 5xx, 429 eller åbent kredsløb) returneres seneste gemte svar,
+    også hvis det er udløbet. Findes der intet, returneres fejlsvaret eller fejlen rejses.
+    Med shared=True bruges altid den delte SQLite cache (til kald fra background callbacks).
+    """
+
+    def fetch():
+        response = http_client.get(
+            provider, url, params=params, headers=headers, timeout=timeout,
+            rate_limit_wait=rate_limit_wait, priority=priority
+        )
+        response = CachedResponse(response.status_code, response.text, response.headers)
+        if http_client.is_failure_status(response.status_code):
+            raise UpstreamFailure(response)
+        return response
+
+    try:
+        return (shared_cache if shared else cache).get_or_fetch(
+            make_key(provider, url, params),
+            PROVIDER_TTL.get(provider, 0),
+            fetch,
+            should_cache=lambda response: response.status_code == 200,
+            refresh=refresh,
+            stale_on_error=True
+        )
+    except UpstreamFailure as e:
+        return e.response
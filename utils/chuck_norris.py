@@ -1,28 +1,90 @@
-import requests
-from dash import html
+import threading
+from collections import deque
+
+from dash import html, dcc, callback, Output, Input
 import dash_bootstrap_components as dbc
+from utils import http_client, metrics
+
+# Pulje af forudhentede jokes, så banneret kan udfyldes uden at vente på API'et
+JOKE_POOL_SIZE = 5
+joke_pool = deque(maxlen=JOKE_POOL_SIZE)
+refill_lock = threading.Lock()
+
+# Seneste joke fra API'et - vises hvis API'et er nede eller kredsløbet er åbent
+last_joke = None
 
 def get_chuck_norris_joke():
-    """Henter en Chuck Norris joke fra API"""
+    """Henter en Chuck Norris joke fra API - seneste joke genbruges hvis API'et fejler"""
+    global last_joke
     try:
-        response = requests.get("https://api.chucknorris.io/jokes/random", timeout=5)
+        response = http_client.get("chucknorris", "https://api.chucknorris.io/jokes/random")
         if response.status_code == 200:
             data = response.json()
-            return data.get("value", "Chuck Norris doesn't need jokes, jokes need Chuck Norris.")
-        return "Chuck Norris is loading..."
+            last_joke = data.get("value", "Chuck Norris doesn't need jokes, jokes need Chuck Norris.")
+            return last_joke
+        return last_joke or "Chuck Norris is loading..."
     except Exception as e:
-        return f"Chuck Norris error: {str(e)}"
+        return last_joke or f"Chuck Norris error: {str(e)}"
+
+def refill_joke_pool():
+    """Fylder puljen op i baggrunden - kun én opfyldning kører ad gangen"""
+    global last_joke
+    if not refill_lock.acquire(blocking=False):
+        return
+    try:
+        while len(joke_pool) < JOKE_POOL_SIZE:
+            response = http_client.get("chucknorris", "https://api.chucknorris.io/jokes/random")
+            if response.status_code != 200:
+                break
+            last_joke = response.json().get("value", "")
+            joke_pool.append(last_joke)
+    except Exception:
+        pass
+    finally:
+        refill_lock.release()
+
+def next_chuck_norris_joke():
+    """Tager en joke fra puljen, eller henter direkte hvis puljen er tom"""
+    try:
+        joke = joke_pool.popleft()
+    except IndexError:
+        joke = get_chuck_norris_joke()
+    threading.Thread(target=refill_joke_pool, daemon=True).start()
+    return joke
 
 def create_chuck_norris_banner():
-    """Opretter en banner komponent med Chuck Norris joke"""
-    joke = get_chuck_norris_joke()
+    """Opretter en banner komponent der udfyldes med en joke efter siden er vist"""
+    return html.Div(
+        [
+            dcc.Store(id="chuck-norris-trigger", data=True),
+            html.Div(
+                dbc.Alert(
+                    [
+                        html.Strong("Chuck Norris Joke: "),
+                        "Chuck Norris is loading..."
+                    ],
+                    color="warning",
+                    className="mb-3",
+                    style={"fontSize": "0.9rem"}
+                ),
+                id="chuck-norris-banner"
+            )
+        ]
+    )
+
+@callback(
+    Output("chuck-norris-banner", "children"),
+    Input("chuck-norris-trigger", "data")
+)
+@metrics.instrument_callback
+def load_chuck_norris_joke(trigger):
+    """Udfylder banneret med en joke når siden er indlæst"""
     return dbc.Alert(
         [
             html.Strong("Chuck Norris Joke: "),
-            joke
+            next_chuck_norris_joke()
         ],
         color="warning",
         className="mb-3",
         style={"fontSize": "0.9rem"}
     )
-
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+from utils.paths import data_path
+
+# Antal fejl i træk (timeouts, forbindelsesfejl, 5xx og 429) før kredsløbet åbnes
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+# Hvor længe (sekunder) et åbent kredsløb afviser kald før et enkelt prøvekald slippes igennem
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Udbyderen har fejlet for mange gange i træk - kaldet afvises uden at vente på timeout"""
+
+
+class BreakerStore:
+    """Kredsløbenes tilstand i SQLite
+
+    Alle worker processer og background callbacks læser og skriver samme fil, så fejl
+    tælles for udbyderen og ikke per proces.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path("circuit", "breakers.sqlite")
+        self.local = threading.local()
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS breakers ("
+            "provider TEXT PRIMARY KEY, state TEXT NOT NULL, failures INTEGER NOT NULL, "
+            "opened_at REAL, probe_until REAL)"
+        )
+
+    def connect(self):
+        """Én forbindelse per tråd - forbindelser må ikke deles på tværs af fork"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def read(self, conn, provider):
+        """(state, failures, opened_at, probe_until) - et ukendt kredsløb er lukket"""
+        row = conn.execute(
+            "SELECT state, failures, opened_at, probe_until FROM breakers WHERE provider = ?", (provider,)
+        ).fetchone()
+        return tuple(row) if row else (CLOSED, 0, None, None)
+
+    def get(self, provider):
+        return self.read(self.connect(), provider)
+
+    def update(self, provider, change):
+        """Kalder change(state, failures, opened_at, probe_until) -> (ny række, resultat) i én transaktion
+
+        Returnerer (gammel tilstand, ny tilstand, resultat).
+        """
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.read(conn, provider)
+            new_row, result = change(*row)
+            if new_row != row:
+                conn.execute(
+                    "INSERT OR REPLACE INTO breakers (provider, state, failures, opened_at, probe_until) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (provider, *new_row)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0], new_row[0], result
+
+    def clear(self):
+        self.connect().execute("DELETE FROM breakers")
+
+
+store = BreakerStore()
+
+
+class CircuitBreaker:
+    """Kredsløb per udbyder: closed -> open efter FAILURE_THRESHOLD fejl -> half_open efter RESET_TIMEOUT
+
+    I half_open slippes ét prøvekald igennem ad gangen på tværs af alle processer. Lykkes
+    det lukkes kredsløbet, ellers åbnes det igen i RESET_TIMEOUT sekunder. Et prøvekald
+    der aldrig melder tilbage (f.eks. et annulleret job) frigives efter RESET_TIMEOUT.
+    """
+
+    def __init__(self, provider, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    @property
+    def state(self):
+        return store.get(self.provider)[0]
+
+    def update(self, change):
+        """Opdaterer tilstanden og tæller overgange"""
+        old_state, new_state, result = store.update(self.provider, change)
+        if new_state != old_state:
+            metrics.inc("mashup_circuit_breaker_transitions_total", provider=self.provider, state=new_state)
+        return result
+
+    def allow(self):
+        """Rejser CircuitOpenError hvis kaldet ikke må sendes - ellers skal udfaldet registreres"""
+        if self.state == CLOSED:
+            return
+
+        def change(state, failures, opened_at, probe_until):
+            now = time.time()
+            if state == CLOSED:
+                return (state, failures, opened_at, probe_until), None
+            if state == OPEN and now - opened_at >= self.reset_timeout:
+                state = HALF_OPEN
+            if state == HALF_OPEN and (probe_until is None or probe_until <= now):
+                return (HALF_OPEN, failures, opened_at, now + self.reset_timeout), None
+            if state == HALF_OPEN:
+                # Et andet prøvekald er i gang - det afgøres senest når det frigives
+                retry_in = probe_until - now
+            else:
+                retry_in = self.reset_timeout - (now - opened_at)
+            return (state, failures, opened_at, probe_until), max(0, retry_in)
+
+        retry_in = self.update(change)
+        if retry_in is not None:
+            raise CircuitOpenError(f"{self.provider} er midlertidigt utilgængelig - prøver igen om {retry_in:.0f} sekunder")
+
+    def record_success(self):
+        state, failures, _, _ = store.get(self.provider)
+        if state == CLOSED and failures == 0:
+            return
+        self.update(lambda *row: ((CLOSED, 0, None, None), None))
+
+    def release(self):
+        """Frigiver et prøvekald der aldrig blev sendt (f.eks. pga. rate limit)"""
+        if self.state != HALF_OPEN:
+            return
+        self.update(lambda state, failures, opened_at, probe_until: ((state, failures, opened_at, None), None))
+
+    def record_failure(self):
+        def change(state, failures, opened_at, probe_until):
+            failures += 1
+            if state == HALF_OPEN or (state == CLOSED and failures >= self.failure_threshold):
+                return (OPEN, failures, time.time(), None), None
+            return (state, failures, opened_at, probe_until), None
+
+        self.update(change)
+
+
+breakers = {}
+breakers_lock = threading.Lock()
+
+
+def get_breaker(provider):
+    breaker = breakers.get(provider)
+    if breaker is None:
+        with breakers_lock:
+            breaker = breakers.setdefault(provider, CircuitBreaker(provider))
+    return breaker
+
+
+def allow(provider):
+    get_breaker(provider).allow()
+
+
+def release(provider):
+    get_breaker(provider).release()
+
+
+def record(provider, ok):
+    if ok:
+        get_breaker(provider).record_success()
+    else:
+        get_breaker(provider).record_failure()
@@ -0,0 +1,132 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # uden brotli bruges kun gzip
+    brotli = None
+
+# Slå komprimering fra med COMPRESSION_ENABLED=0, f.eks. hvis en reverse proxy allerede komprimerer
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+
+# Svar mindre end dette (bytes) sendes ukomprimeret - gevinsten er mindre end omkostningen
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+
+# Maksimal størrelse (bytes) af cachen med komprimerede statiske filer per proces
+STATIC_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_STATIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "image/svg+xml",
+}
+
+# Statiske filer (Dash/Bootstrap/Plotly bundles og assets/) komprimeres én gang med højeste niveau
+STATIC_PREFIXES = ("/_dash-component-suites/", "/assets/")
+
+# encoding -> (niveau for callback svar, niveau for statiske filer)
+LEVELS = {
+    "br": (4, 11),
+    "gzip": (6, 9),
+}
+
+static_cache = OrderedDict()
+static_cache_bytes = 0
+static_cache_lock = threading.Lock()
+
+
+def accepted_encodings(header):
+    """Encodings fra Accept-Encoding der ikke er afvist med q=0"""
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(name.lower())
+    return encodings
+
+
+def choose_encoding(header):
+    encodings = accepted_encodings(header)
+    if brotli is not None and "br" in encodings:
+        return "br"
+    if "gzip" in encodings or "*" in encodings:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding, static):
+    level = LEVELS[encoding][1 if static else 0]
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def cached_compress(key, data, encoding):
+    """Komprimerer en statisk fil én gang per proces og genbruger resultatet"""
+    global static_cache_bytes
+    with static_cache_lock:
+        compressed = static_cache.get(key)
+        if compressed is not None:
+            static_cache.move_to_end(key)
+            return compressed
+    compressed = compress(data, encoding, static=True)
+    with static_cache_lock:
+        if key not in static_cache:
+            static_cache[key] = compressed
+            static_cache_bytes += len(compressed)
+            while static_cache_bytes > STATIC_CACHE_MAX_BYTES and len(static_cache) > 1:
+                _, evicted = static_cache.popitem(last=False)
+                static_cache_bytes -= len(evicted)
+    return compressed
+
+
+def is_static(path):
+    return any(prefix in path for prefix in STATIC_PREFIXES)
+
+
+def compress_response(response):
+    """after_request: komprimerer callback svar og statiske filer med br eller gzip"""
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or request.method == "HEAD"
+        or response.is_streamed and not response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+
+    # Filer fra send_file læses først ind her
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    if is_static(request.path):
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified") or len(data)
+        compressed = cached_compress((request.full_path, encoding, validator), data, encoding)
+    else:
+        compressed = compress(data, encoding, static=False)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # Byte ranges ville gælde den ukomprimerede fil
+    response.headers.pop("Accept-Ranges", None)
+    return response
+
+
+def init_app(server):
+    """Komprimerer svar fra Flask serveren (gzip, og brotli hvis det er installeret)"""
+    if COMPRESSION_ENABLED:
+        server.after_request(compress_response)
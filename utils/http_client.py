@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+from urllib3.util.retry import Retry
+from utils import circuit_breaker, metrics, rate_limit
+
+load_dotenv()
+
+# Timeouts (connect, read) i sekunder per udbyder
+TIMEOUTS = {
+    "nyt": (3.05, 10),
+    "youtube": (3.05, 10),
+    "trakt": (3.05, 10),
+    "sanity": (3.05, 10),
+    "dbpedia": (3.05, 30),
+    "chucknorris": (3.05, 5),
+    "images": (3.05, 10),
+}
+
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Størrelse på connection pool per udbyder - svarer til antal samtidige kald pr. worker
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Hvor længe (sekunder) et kald højst venter på udbyderens rate limit
+RATE_LIMIT_WAIT = float(os.getenv("RATE_LIMIT_WAIT", "10"))
+
+# Sender alle kald til en lokal stub server i stedet for de rigtige API'er (se benchmarks/)
+UPSTREAM_OVERRIDE = os.getenv("HTTP_UPSTREAM_OVERRIDE", "").rstrip("/")
+
+# Statuskoder der forsøges igen med backoff
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+def is_failure_status(status_code):
+    """Svar der tæller som fejl for udbyderens circuit breaker (fejl hos udbyderen eller rate limit)"""
+    return status_code == 429 or status_code >= 500
+
+
+def is_timeout(error):
+    """Timeouts der når frem som ConnectionError, fordi urllib3 har opbrugt sine forsøg (MaxRetryError)"""
+    reason = error.args[0] if error.args else None
+    return isinstance(reason, MaxRetryError) and isinstance(reason.reason, ReadTimeoutError)
+
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def default_headers(provider):
+    """Standard headers der sendes med hvert kald til udbyderen"""
+    headers = {"Accept": "application/json"}
+    if provider == "trakt":
+        headers.update({
+            "Content-Type": "application/json",
+            "trakt-api-version": "2",
+            "trakt-api-key": os.getenv("TRAKT_CLIENT_ID", "")
+        })
+    return headers
+
+
+def create_session(provider):
+    """Opretter en keep-alive session med connection pool og retry"""
+    session = requests.Session()
+    # Kun statuskoder og én fejlet forbindelse forsøges igen - et hængende svar har allerede
+    # brugt hele read timeouten, så det forsøges ikke igen
+    retry = Retry(
+        total=2,
+        connect=1,
+        read=False,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    if provider in rate_limit.quotas:
+        # Udbydere med kvote forsøges aldrig igen af urllib3 - hvert forsøg bruger af kvoten,
+        # så hvert kald skal have plads i regnskabet (rate_limit.acquire)
+        retry = 0
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(default_headers(provider))
+    return session
+
+
+def get_session(provider):
+    """Returnerer den delte session for en udbyder"""
+    session = sessions.get(provider)
+    if session is None:
+        with sessions_lock:
+            session = sessions.get(provider)
+            if session is None:
+                session = sessions[provider] = create_session(provider)
+    return session
+
+
+def upstream_url(url):
+    """Omskriver https://host/sti til <UPSTREAM_OVERRIDE>/host/sti når der køres mod en stub server"""
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{UPSTREAM_OVERRIDE}/{parts.netloc}{parts.path}{query}"
+
+
+def get(provider, url, params=None, headers=None, timeout=None, rate_limit_wait=None, priority=rate_limit.REFRESH,
+        allow_redirects=True):
+    """GET request gennem udbyderens delte session
+
+    Udbydere med kvote (utils/rate_limit.py) venter højst rate_limit_wait sekunder på plads
+    (0 = vent ikke) og rejser ellers RateLimitExceeded. priority afgør hvor meget af kvoten
+    kaldet må bruge - søgninger og prefetch lader en del stå til baggrundsopdateringer. Har udbyderen fejlet for mange
+    gange i træk, rejses CircuitOpenError med det samme (se utils/circuit_breaker.py).
+    Med allow_redirects=False returneres et redirect som det er, uden at følge det.
+    """
+    try:
+        circuit_breaker.allow(provider)
+    except circuit_breaker.CircuitOpenError:
+        metrics.inc("mashup_upstream_errors_total", provider=provider, error="circuit_open")
+        raise
+    try:
+        rate_limit.acquire(provider, RATE_LIMIT_WAIT if rate_limit_wait is None else rate_limit_wait, priority)
+    except rate_limit.RateLimitExceeded:
+        # Kaldet blev aldrig sendt, så et eventuelt prøvekald frigives uden at tælle som fejl
+        circuit_breaker.release(provider)
+        metrics.inc("mashup_upstream_errors_total", provider=provider, error="rate_limit")
+        raise
+    start = time.perf_counter()
+    try:
+        response = get_session(provider).get(
+            upstream_url(url),
+            params=params,
+            headers=headers,
+            timeout=timeout or TIMEOUTS.get(provider, DEFAULT_TIMEOUT),
+            allow_redirects=allow_redirects
+        )
+    except requests.Timeout:
+        circuit_breaker.record(provider, ok=False)
+        metrics.inc("mashup_upstream_errors_total", provider=provider, error="timeout")
+        raise
+    except requests.ConnectionError as e:
+        circuit_breaker.record(provider, ok=False)
+        metrics.inc("mashup_upstream_errors_total", provider=provider, error="timeout" if is_timeout(e) else "connection")
+        raise
+    except requests.RequestException as e:
+        circuit_breaker.record(provider, ok=False)
+        metrics.inc("mashup_upstream_errors_total", provider=provider, error=type(e).__name__)
+        raise
+    finally:
+        metrics.observe("mashup_upstream_request_duration_seconds", time.perf_counter() - start, provider=provider)
+    circuit_breaker.record(provider, ok=not is_failure_status(response.status_code))
+    rate_limit.record_response(provider, response)
+    metrics.inc("mashup_upstream_responses_total", provider=provider, status=response.status_code)
+    metrics.inc("mashup_upstream_response_bytes_total", len(response.content), provider=provider)
+    return response
@@ -0,0 +1,170 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from io import BytesIO
+from urllib.parse import quote, urlsplit
+
+from flask import abort, request, send_file
+
+from utils import http_client
+from utils.paths import data_path
+
+try:
+    from PIL import Image
+except ImportError:  # uden Pillow caches og leveres den valgte rendition uden nedskalering
+    Image = None
+
+# Bredder (px) proxyen laver thumbnails i - kortenes billedkolonne er 4 af 12 kolonner
+THUMBNAIL_WIDTHS = (160, 320, 480, 640)
+DEFAULT_WIDTH = 320
+
+# Hvor bredt billedet vises i forhold til skærmen, så browseren kan vælge fra srcset
+THUMBNAIL_SIZES = "(min-width: 1200px) 28vw, (min-width: 768px) 33vw, 90vw"
+
+# Kun billeder fra disse hosts hentes gennem proxyen
+THUMBNAIL_HOSTS = set(
+    os.getenv("THUMBNAIL_HOSTS", "static01.nyt.com,static01.nytimes.com,www.nytimes.com,i.ytimg.com").split(",")
+)
+
+# Maksimalt antal thumbnails på disk før de ældste slettes
+MAX_THUMBNAILS = int(os.getenv("THUMBNAIL_CACHE_MAX_FILES", "5000"))
+
+# Thumbnails ændrer sig ikke for en given URL og bredde, så browseren må cache dem længe
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+writes = 0
+writes_lock = threading.Lock()
+
+
+def pick_rendition(renditions, width):
+    """Mindste rendition der er mindst `width` bred - ellers den største der findes"""
+    sized = sorted((r for r in renditions if r.get("width")), key=lambda r: r["width"])
+    for rendition in sized:
+        if rendition["width"] >= width:
+            return rendition
+    if sized:
+        return sized[-1]
+    return renditions[0] if renditions else None
+
+
+def thumbnail_url(url, width):
+    return f"/thumbnails/{width}?url={quote(url, safe='')}"
+
+
+def responsive_image(renditions):
+    """Billede til et kort: src og srcset peger på proxyen, ud fra den mindste tilstrækkelige rendition
+
+    renditions er en liste af {"url", "width", "height"} (width/height kan mangle).
+    Returnerer None hvis der ikke er nogen brugbare billeder.
+    """
+    renditions = [r for r in renditions if r.get("url")]
+    if not renditions:
+        return None
+    largest = max((r.get("width") or 0 for r in renditions), default=0)
+    # Ingen grund til at tilbyde bredder der er større end den største rendition
+    widths = [w for w in THUMBNAIL_WIDTHS if not largest or w <= largest] or [THUMBNAIL_WIDTHS[0]]
+    srcset = ", ".join(f"{thumbnail_url(pick_rendition(renditions, w)['url'], w)} {w}w" for w in widths)
+    default_width = min(DEFAULT_WIDTH, widths[-1])
+    rendition = pick_rendition(renditions, default_width)
+    image = {
+        "src": thumbnail_url(rendition["url"], default_width),
+        "srcset": srcset,
+        "sizes": THUMBNAIL_SIZES
+    }
+    # Billedformatet reserverer pladsen før billedet er hentet
+    if rendition.get("width") and rendition.get("height"):
+        image["ratio"] = f"{rendition['width']} / {rendition['height']}"
+    return image
+
+
+def is_allowed(url):
+    parts = urlsplit(url)
+    return parts.scheme == "https" and parts.hostname in THUMBNAIL_HOSTS
+
+
+def downscale(content, width):
+    """Skalerer billedet ned til `width` og gemmer som WebP"""
+    with Image.open(BytesIO(content)) as image:
+        if image.width > width:
+            image.thumbnail((width, round(image.height * width / image.width)))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        output = BytesIO()
+        image.save(output, "WEBP", quality=80, method=4)
+    return output.getvalue()
+
+
+def prune():
+    """Sletter de ældste thumbnails når der er flere end MAX_THUMBNAILS"""
+    directory = os.path.dirname(data_path("thumbnails", "x"))
+    entries = [entry for entry in os.scandir(directory) if entry.is_file() and not entry.name.endswith(".tmp")]
+    if len(entries) <= MAX_THUMBNAILS:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:len(entries) - MAX_THUMBNAILS]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def cached_thumbnail(url, width):
+    """Returnerer stien til en thumbnail på disk - hentes og skaleres første gang"""
+    key = hashlib.sha256(f"{url}|{width}".encode("utf-8")).hexdigest()
+    for extension in (".webp", ".img"):
+        path = data_path("thumbnails", key + extension)
+        if os.path.exists(path):
+            return path
+
+    # Redirects følges ikke - de kunne føre til en vært uden for THUMBNAIL_HOSTS
+    response = http_client.get("images", url, headers={"Accept": "image/*"}, allow_redirects=False)
+    if response.status_code != 200 or not response.headers.get("Content-Type", "").startswith("image/"):
+        return None
+    content = response.content
+    extension = ".img"
+    if Image is not None:
+        try:
+            content = downscale(content, width)
+            extension = ".webp"
+        except (OSError, ValueError):
+            # Formater Pillow ikke kan læse leveres uændret
+            pass
+
+    path = data_path("thumbnails", key + extension)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+    global writes
+    with writes_lock:
+        writes += 1
+        should_prune = writes % 100 == 0
+    if should_prune:
+        prune()
+    return path
+
+
+def init_app(server):
+    """Registrerer /thumbnails/<bredde>?url=... på Flask serveren"""
+
+    @server.route("/thumbnails/<int:width>")
+    def thumbnail(width):
+        url = request.args.get("url", "")
+        if width not in THUMBNAIL_WIDTHS or not is_allowed(url):
+            abort(404)
+        try:
+            path = cached_thumbnail(url, width)
+        except Exception:
+            path = None
+        if path is None:
+            abort(502)
+        if path.endswith(".webp"):
+            mimetype = "image/webp"
+        else:
+            mimetype = mimetypes.guess_type(urlsplit(url).path)[0] or "image/jpeg"
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=CACHE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
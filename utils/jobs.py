@@ -0,0 +1,143 @@
+import os
+import pickle
+import signal
+import socket
+import struct
+
+from dash import DiskcacheManager
+
+from utils.paths import data_path
+
+# Hvor ofte (sekunder) launcheren tjekker om appens proces stadig kører
+POLL_INTERVAL = 1.0
+
+
+def send_message(conn, value):
+    data = pickle.dumps(value)
+    conn.sendall(struct.pack("!I", len(data)) + data)
+
+
+def receive_message(conn):
+    header = receive_exactly(conn, 4)
+    return pickle.loads(receive_exactly(conn, struct.unpack("!I", header)[0]))
+
+
+def receive_exactly(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Forbindelsen til launcheren blev lukket")
+        data += chunk
+    return data
+
+
+class LauncherDiskcacheManager(DiskcacheManager):
+    """DiskcacheManager der forker background callbacks fra en launcher proces uden tråde
+
+    Appens proces kører scheduler, prefetch og request tråde. Forkes et job
+    mens en af dem holder en lås (f.eks. et jobs lås i scheduleren eller SQLite), arver
+    barnet låsen som taget og kan hænge. Launcheren forkes fra appen før nogen af trådene
+    startes og forker selv alle jobs, så de altid starter fra en tilstand uden låse.
+    Uden fork (Windows) bruges DiskcacheManager som den er.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = None
+        self.launcher_pid = None
+
+    def start_launcher(self):
+        """Forker launcheren - kaldes når alle callbacks er registreret og før tråde startes"""
+        if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX") or self.launcher_pid is not None:
+            return
+        self.socket_path = data_path("callbacks", f"launcher-{os.getpid()}.sock")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            listener.listen(64)
+        except OSError:
+            # F.eks. en for lang sti til socketen - jobs forkes så af appen selv
+            listener.close()
+            return
+        app_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.serve(listener, app_pid)
+            finally:
+                os._exit(0)
+        listener.close()
+        self.launcher_pid = pid
+
+    def serve(self, listener, app_pid):
+        """Launcherens løkke - stopper når appens proces er stoppet"""
+        # Ctrl+C i udviklingsserveren stopper appen, og launcheren følger efter
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        # Færdige jobs ryddes op af kernen, så de ikke bliver til zombier
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        listener.settimeout(POLL_INTERVAL)
+        while os.getppid() == app_pid:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                conn.settimeout(None)
+                try:
+                    registry_key, key, progress_key, args, context = receive_message(conn)
+                    send_message(conn, self.fork_job(listener, conn, registry_key, key, progress_key, args, context))
+                except Exception:
+                    # Et job der ikke kunne startes - appen forker det selv
+                    continue
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def fork_job(self, listener, conn, registry_key, key, progress_key, args, context):
+        """Forker ét job og returnerer dets pid - None hvis callbacken ikke er registreret"""
+        job_fn = self.func_registry.get(registry_key)
+        if job_fn is None:
+            return None
+        pid = os.fork()
+        if pid == 0:
+            try:
+                listener.close()
+                conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.default_int_handler)
+                job_fn(key, progress_key, args, context)
+            finally:
+                os._exit(0)
+        return pid
+
+    def terminate_job(self, job):
+        # Launcherens jobs ryddes op af kernen så snart de stopper (ingen zombier), så et job
+        # kan forsvinde mellem Dash' tjek af pid'en og oprydningen
+        import psutil
+
+        try:
+            super().terminate_job(job)
+        except psutil.NoSuchProcess:
+            pass
+
+    def call_job_fn(self, key, job_fn, args, context):
+        registry_key = next((name for name, fn in self.func_registry.items() if fn is job_fn), None)
+        if self.launcher_pid is None or registry_key is None:
+            return super().call_job_fn(key, job_fn, args, context)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(self.socket_path)
+                send_message(conn, (registry_key, key, self._make_progress_key(key), args, context))
+                pid = receive_message(conn)
+        except Exception:
+            pid = None
+        if pid is None:
+            # Launcheren er stoppet eller kender ikke callbacken - fork som Dash selv gør
+            return super().call_job_fn(key, job_fn, args, context)
+        return pid
@@ -0,0 +1,226 @@
+import functools
+import json
+import os
+import threading
+import time
+
+from flask import Response
+
+from utils.paths import data_path
+
+try:
+    import fcntl
+except ImportError:  # Windows - kun én proces skriver til aggregatet
+    fcntl = None
+
+# Hvor ofte (sekunder) hver proces skriver sine målinger til det fælles aggregat
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# navn -> (type, beskrivelse, labels)
+METRICS = {
+    "mashup_callback_duration_seconds": (
+        "histogram", "Tid brugt i Dash callbacks", ("callback",)
+    ),
+    "mashup_callback_errors_total": (
+        "counter", "Dash callbacks der rejste en fejl", ("callback", "error")
+    ),
+    "mashup_dashboard_sources_total": (
+        "counter", "Resultat af dashboardets kald per datakilde (ok, error, deadline)", ("source", "result")
+    ),
+    "mashup_upstream_request_duration_seconds": (
+        "histogram", "Varighed af HTTP kald til API udbydere", ("provider",)
+    ),
+    "mashup_upstream_responses_total": (
+        "counter", "Svar fra API udbydere per statuskode", ("provider", "status")
+    ),
+    "mashup_upstream_errors_total": (
+        "counter", "HTTP kald der fejlede uden svar (timeout, connection, rate_limit, circuit_open, ...)", ("provider", "error")
+    ),
+    "mashup_upstream_response_bytes_total": (
+        "counter", "Bytes modtaget fra API udbydere", ("provider",)
+    ),
+    "mashup_cache_requests_total": (
+        "counter", "Cache opslag per udbyder (hit, miss, coalesced, shared, refresh, stale)", ("provider", "result")
+    ),
+    "mashup_quota_requests_total": (
+        "counter", "Kald til udbydere med kvote per prioritet (admitted, queued, shed)", ("provider", "priority", "result")
+    ),
+    "mashup_circuit_breaker_transitions_total": (
+        "counter", "Skift i udbydernes circuit breaker (open, half_open, closed)", ("provider", "state")
+    ),
+}
+
+
+class Registry:
+    """Målinger for den aktuelle proces siden sidste flush
+
+    Hver proces (gunicorn workers og background callback jobs) lægger sine ændringer
+    til et fælles aggregat på disk, så /metrics viser det samme uanset hvilken worker svarer.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def reset_after_fork(self):
+        # Låsen kan være taget af en anden tråd i forælderen i det øjeblik der forkes
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            # [antal per bucket..., +Inf, sum]
+            counts = self.series.get(key)
+            if counts is None:
+                counts = self.series[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def take(self):
+        """Returnerer og nulstiller ændringerne siden sidste flush"""
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+
+registry = Registry()
+
+# Et forket barn (background callback job) må ikke tælle forælderens ikke-flushede målinger med.
+# Uden fork (Windows) findes register_at_fork ikke, og der er ingen forkede børn at nulstille
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset_after_fork)
+
+flush_thread = None
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def aggregate_path():
+    return data_path("metrics", "aggregate.json")
+
+
+def flush():
+    """Lægger processens ændringer til aggregatet på disk og returnerer det samlede resultat"""
+    series = registry.take()
+    with open(data_path("metrics", "aggregate.lock"), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(aggregate_path(), encoding="utf-8") as f:
+                totals = {(name, tuple(map(tuple, labels))): value for name, labels, value in json.load(f)}
+        except (OSError, ValueError):
+            totals = {}
+        if series:
+            for key, value in series.items():
+                current = totals.get(key)
+                if isinstance(value, list):
+                    totals[key] = [a + b for a, b in zip(current, value)] if current else value
+                else:
+                    totals[key] = (current or 0) + value
+            tmp_path = f"{aggregate_path()}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([[name, labels, value] for (name, labels), value in totals.items()], f)
+            os.replace(tmp_path, aggregate_path())
+    return totals
+
+
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{label_value(value)}"' for name, value in pairs) + "}"
+
+
+def render(totals):
+    """Prometheus tekstformat"""
+    lines = []
+    for name, (kind, description, _) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == "histogram":
+                for bound, count in zip(LATENCY_BUCKETS, value):
+                    lines.append(f"{name}_bucket{format_labels(labels, ('le', f'{bound:g}'))} {count}")
+                lines.append(f"{name}_bucket{format_labels(labels, ('le', '+Inf'))} {value[-2]}")
+                lines.append(f"{name}_count{format_labels(labels)} {value[-2]}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value[-1]:.6f}")
+            else:
+                lines.append(f"{name}{format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def run_flusher():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def start_flusher():
+    """Starter periodisk flush i denne proces (kaldes igen efter fork i gunicorn workers)"""
+    global flush_thread
+    if flush_thread is not None and flush_thread.is_alive():
+        return
+    flush_thread = threading.Thread(target=run_flusher, name="metrics-flush", daemon=True)
+    flush_thread.start()
+
+
+def instrument_callback(func):
+    """Måler varighed og fejl for en Dash callback - placeres under @callback
+
+    Background callbacks kører i en forket proces uden flush-tråd, så der flushes
+    når callbacken er færdig.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            inc("mashup_callback_errors_total", callback=name, error=type(e).__name__)
+            raise
+        finally:
+            observe("mashup_callback_duration_seconds", time.perf_counter() - start, callback=name)
+            if flush_thread is None or not flush_thread.is_alive():
+                try:
+                    flush()
+                except OSError:
+                    pass
+
+    return wrapper
+
+
+def init_app(server):
+    """Registrerer /metrics på Flask serveren og starter periodisk flush"""
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(render(flush()), mimetype="text/plain; version=0.0.4")
+
+    start_flusher()
@@ -0,0 +1,76 @@
+import math
+
+from dash import html, dcc, clientside_callback, ClientsideFunction, Output, Input
+import dash_bootstrap_components as dbc
+
+# Valgmuligheder for antal kort per side
+PAGE_SIZES = [10, 20, 50]
+DEFAULT_PAGE_SIZE = 10
+
+def create_paginated_list(prefix, page_size=DEFAULT_PAGE_SIZE):
+    """Opretter en liste hvor kun den synlige side af kort sendes til browseren
+
+    Komponenterne får id'erne <prefix>-content, <prefix>-items, <prefix>-cards,
+    <prefix>-pagination og <prefix>-page-size. Callbacks lægger overskrifter og fejl i
+    <prefix>-content og kompakte records for kortene i <prefix>-items.
+    """
+    return html.Div(
+        [
+            html.Div(id=f"{prefix}-content"),
+            dcc.Store(id=f"{prefix}-items"),
+            html.Div(id=f"{prefix}-cards"),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Pagination(
+                            id=f"{prefix}-pagination",
+                            max_value=1,
+                            active_page=1,
+                            fully_expanded=False,
+                            first_last=True,
+                            previous_next=True
+                        ),
+                        width="auto"
+                    ),
+                    dbc.Col(
+                        dbc.Select(
+                            id=f"{prefix}-page-size",
+                            options=[{"label": f"{size} per side", "value": str(size)} for size in PAGE_SIZES],
+                            value=str(page_size),
+                            size="sm"
+                        ),
+                        width="auto"
+                    )
+                ],
+                className="align-items-center justify-content-between mt-2"
+            )
+        ]
+    )
+
+def register_card_renderer(prefix, function_name):
+    """Bygger kortene i browseren med window.dash_clientside.cards.<function_name> (assets/cards.js)"""
+    clientside_callback(
+        ClientsideFunction(namespace="cards", function_name=function_name),
+        Output(f"{prefix}-cards", "children"),
+        Input(f"{prefix}-items", "data")
+    )
+
+def page_count(total, page_size):
+    """Antal sider for et givet antal items - mindst én"""
+    return max(1, math.ceil(total / page_size))
+
+def paginate(items, active_page, page_size):
+    """Returnerer (synlige items, aktiv side, antal sider) med siden holdt inden for grænserne"""
+    page_size = int(page_size or DEFAULT_PAGE_SIZE)
+    max_page = page_count(len(items), page_size)
+    active_page = min(max(int(active_page or 1), 1), max_page)
+    start = (active_page - 1) * page_size
+    return items[start:start + page_size], active_page, max_page
+
+def single_page(children, *extra):
+    """Output til en paginated liste der kun viser én komponent, f.eks. en fejlbesked
+
+    Outputs er (content, items, max_value, active_page) - ekstra outputs fra callbacken
+    kan gives med og lægges bagerst.
+    """
+    return (children, [], 1, 1, *extra)
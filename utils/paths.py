@@ -0,0 +1,10 @@
+import os
+
+# Mappe til lokale data (indeks, caches m.m.) - kan flyttes med MASHUP_DATA_DIR
+DATA_DIR = os.getenv("MASHUP_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+def data_path(*parts):
+    """Returnerer en sti i data mappen og opretter mappen hvis den mangler"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,187 @@
+import os
+import time
+from dotenv import load_dotenv
+from utils.cache import cached_get
+from utils.sanity import BOOKS_QUERY, BOOK_STATS_QUERY, sanity_query
+from utils.trakt import HistorySync
+from utils.youtube import PlaylistSync
+from utils.scheduler import scheduler
+from utils.store import mirror
+
+load_dotenv()
+
+# Din YouTube playlist ID
+PLAYLIST_ID = os.getenv("YOUTUBE_PLAYLIST_ID", "PLkZ_a_mCRqgLgl3Gk4gd5cheR4IXmFwdB")
+
+# Lokalt indeks over hele playlisten - synkroniseres inkrementelt med ETags
+playlist_sync = PlaylistSync(PLAYLIST_ID)
+
+# Dit Trakt.tv brugernavn - uden brugernavn oprettes hverken indeks eller scheduler job
+TRAKT_USERNAME = os.getenv("TRAKT_USERNAME", "")
+
+# Lokalt indeks over hele Trakt historikken - kun nye visninger hentes efter første synkronisering
+trakt_sync = HistorySync(TRAKT_USERNAME) if TRAKT_USERNAME else None
+
+# Opdateringsinterval (sekunder) per datasæt - kan overskrives med REFRESH_INTERVAL_<NAVN>
+REFRESH_INTERVALS = {
+    "nyt_most_viewed": int(os.getenv("REFRESH_INTERVAL_NYT", "600")),
+    "youtube_playlist": int(os.getenv("REFRESH_INTERVAL_YOUTUBE", "1800")),
+    "trakt_history": int(os.getenv("REFRESH_INTERVAL_TRAKT", "300")),
+    "sanity_books": int(os.getenv("REFRESH_INTERVAL_SANITY", "300")),
+    "sanity_book_stats": int(os.getenv("REFRESH_INTERVAL_SANITY", "300")),
+}
+
+class ProviderError(Exception):
+    """Et API svarede med en fejlstatus - vises kun hvis der ikke findes gemte data"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+
+def stored_summary(name, refresh, **identity):
+    """Uden refresh bruges spejlet på disk, som lederen (eller en tidligere kørsel) har skrevet
+
+    identity (f.eks. playlist_id) skal matche, så et skift i .env ikke viser de gamle data.
+    """
+    if refresh:
+        return None
+    summary = mirror.summary(name)
+    if summary is None or any(summary.get(key) != value for key, value in identity.items()):
+        return None
+    return summary
+
+def compact_article(article):
+    """Gemmer kun de felter fra en NYT artikel som News siden bruger"""
+    renditions = []
+    for media in article.get("media") or []:
+        if isinstance(media, dict):
+            renditions = [
+                {"url": img.get("url"), "width": img.get("width"), "height": img.get("height")}
+                for img in media.get("media-metadata") or []
+                if isinstance(img, dict)
+            ]
+            break
+    return {
+        "id": article.get("id") or article.get("uri") or article.get("url"),
+        "title": article.get("title", "No title"),
+        "abstract": article.get("abstract", "No abstract"),
+        "byline": article.get("byline", ""),
+        "url": article.get("url", "#"),
+        "published_date": article.get("published_date", ""),
+        "section": article.get("section", ""),
+        "media": [{"media-metadata": renditions}] if renditions else []
+    }
+
+def fetch_nyt_most_viewed(refresh=False, stored_only=False):
+    """Henter de mest sete NYT artikler (7 dage) ind i spejlet"""
+    api_key = os.getenv("NYT_API_KEY", "")
+    if not api_key:
+        return None
+    summary = stored_summary("nyt_most_viewed", refresh)
+    if summary or stored_only:
+        return summary
+    url = "https://api.nytimes.com/svc/mostpopular/v2/viewed/7.json"
+    response = cached_get("nyt", url, params={"api-key": api_key}, refresh=refresh)
+    if response.status_code != 200:
+        raise ProviderError(response.status_code, response.text)
+    articles = [compact_article(article) for article in response.json().get("results", [])]
+    return mirror.save(
+        "nyt_most_viewed", {"total": len(articles)}, "nyt_articles", articles,
+        id_of=lambda article: article["id"], date_of=lambda article: article["published_date"]
+    )
+
+def fetch_youtube_playlist(refresh=False, stored_only=False):
+    """Synkroniserer hele YouTube playlisten ind i spejlet"""
+    api_key = os.getenv("YOUTUBE_API_KEY", "")
+    if not api_key:
+        return None
+    summary = stored_summary("youtube_playlist", refresh, playlist_id=PLAYLIST_ID)
+    if summary or stored_only:
+        return summary
+    # En anden proces kan have synkroniseret siden indekset blev læst
+    playlist_sync.reload_if_changed()
+    snapshot = playlist_sync.sync(api_key)
+    return mirror.save(
+        "youtube_playlist", {"playlist_id": PLAYLIST_ID, "total": snapshot["total"]}, "youtube_items", snapshot["items"],
+        id_of=lambda item: item["videoId"], date_of=lambda item: item["publishedAt"]
+    )
+
+def fetch_trakt_history(refresh=False, stored_only=False):
+    """Synkroniserer hele brugerens film historik fra Trakt.tv ind i spejlet med rollups per måned og år"""
+    if trakt_sync is None or not os.getenv("TRAKT_CLIENT_ID", ""):
+        return None
+    summary = stored_summary("trakt_history", refresh, username=trakt_sync.username)
+    if summary or stored_only:
+        return summary
+    trakt_sync.reload_if_changed()
+    snapshot = trakt_sync.sync()
+    return mirror.save(
+        "trakt_history",
+        {
+            "username": trakt_sync.username,
+            "total": snapshot["total"],
+            "months": snapshot["months"],
+            "years": snapshot["years"]
+        },
+        "trakt_history",
+        snapshot["items"],
+        id_of=lambda item: item["id"],
+        date_of=lambda item: item["watched_at"]
+    )
+
+def fetch_sanity_books(refresh=False, stored_only=False):
+    """Henter alle bøger fra Sanity, nyeste først, ind i spejlet"""
+    if not os.getenv("SANITY_PROJECT_ID", ""):
+        return None
+    summary = stored_summary("sanity_books", refresh)
+    if summary or stored_only:
+        return summary
+    response = sanity_query(BOOKS_QUERY, refresh=refresh)
+    if response.status_code != 200:
+        raise ProviderError(response.status_code, response.text)
+    books = response.json().get("result") or []
+    return mirror.save(
+        "sanity_books", {"total": len(books)}, "sanity_books", books,
+        id_of=lambda book: book.get("_id"), date_of=lambda book: book.get("_createdAt")
+    )
+
+def fetch_sanity_book_stats(refresh=False, stored_only=False):
+    """Henter antal bøger og antal færdige bøger i én query"""
+    if not os.getenv("SANITY_PROJECT_ID", ""):
+        return None
+    summary = stored_summary("sanity_book_stats", refresh)
+    if summary or stored_only:
+        return summary
+    response = sanity_query(BOOK_STATS_QUERY, refresh=refresh)
+    if response.status_code != 200:
+        raise ProviderError(response.status_code, response.text)
+    stats = response.json().get("result") or {}
+    return mirror.save("sanity_book_stats", {"total": stats.get("total", 0), "completed": stats.get("completed", 0)})
+
+def is_synced(summary):
+    return summary is not None
+
+def summary_age(summary):
+    """Sekunder siden datasættet blev gemt i spejlet"""
+    return time.time() - summary["updated_at"]
+
+def stored(fetch):
+    """Læser kun datasættet fra spejlet (stored_only) - scheduleren viser det før første opdatering og ved fejl"""
+    return lambda: fetch(stored_only=True)
+
+scheduler.register("nyt_most_viewed", fetch_nyt_most_viewed, REFRESH_INTERVALS["nyt_most_viewed"], is_synced, summary_age, stored(fetch_nyt_most_viewed))
+scheduler.register("youtube_playlist", fetch_youtube_playlist, REFRESH_INTERVALS["youtube_playlist"], is_synced, summary_age, stored(fetch_youtube_playlist))
+if trakt_sync is not None:
+    scheduler.register("trakt_history", fetch_trakt_history, REFRESH_INTERVALS["trakt_history"], is_synced, summary_age, stored(fetch_trakt_history))
+scheduler.register("sanity_books", fetch_sanity_books, REFRESH_INTERVALS["sanity_books"], is_synced, summary_age, stored(fetch_sanity_books))
+scheduler.register("sanity_book_stats", fetch_sanity_book_stats, REFRESH_INTERVALS["sanity_book_stats"], is_synced, summary_age, stored(fetch_sanity_book_stats))
+
+def get_provider_data(name):
+    """Returnerer metadata for et datasæt - selve rækkerne læses fra spejlet (utils/store.py)
+
+    None betyder at udbyderen ikke er sat op. Fejl rejses kun hvis der aldrig er hentet data.
+    """
+    if name not in scheduler.jobs:
+        return None
+    return scheduler.get(name)
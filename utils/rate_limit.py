@@ -0,0 +1,274 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify
+
+from utils import metrics
+from utils.paths import data_path
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9 - døgnet regnes i UTC
+    ZoneInfo = None
+
+
+class RateLimitExceeded(Exception):
+    """Der var ingen kald tilbage i udbyderens rate limit eller kvote inden for ventetiden"""
+
+
+# Prioriteter - baggrundsopdateringer af datasæt går før søgninger, som går før prefetch
+REFRESH = "refresh"
+SEARCH = "search"
+PREFETCH = "prefetch"
+
+# Andel af minut- og døgnkvoten som en prioritet skal lade stå urørt til højere prioriteter
+RESERVES = {
+    REFRESH: 0.0,
+    SEARCH: float(os.getenv("QUOTA_SEARCH_RESERVE", "0.2")),
+    PREFETCH: float(os.getenv("QUOTA_PREFETCH_RESERVE", "0.5")),
+}
+
+# NYT tillader 5 kald i minuttet og 500 i døgnet per API nøgle
+NYT_RATE_PER_MINUTE = int(os.getenv("NYT_RATE_PER_MINUTE", "5"))
+NYT_QUOTA_PER_DAY = int(os.getenv("NYT_QUOTA_PER_DAY", "500"))
+
+# YouTube Data API giver 10.000 enheder i døgnet - playlistItems.list koster 1 enhed
+YOUTUBE_QUOTA_PER_DAY = int(os.getenv("YOUTUBE_QUOTA_PER_DAY", "10000"))
+
+# Tidszone hvor døgnkvoterne nulstilles ved midnat (YouTube bruger Pacific Time)
+QUOTA_TIMEZONE = os.getenv("QUOTA_TIMEZONE", "America/Los_Angeles")
+
+# Pause (sekunder) efter et 429 svar uden Retry-After header
+BACK_OFF = float(os.getenv("QUOTA_BACK_OFF", "60"))
+
+# Længde af minutvinduet i sekunder
+WINDOW = 60
+
+
+def quota_timezone():
+    if ZoneInfo is None:
+        return timezone.utc
+    try:
+        return ZoneInfo(QUOTA_TIMEZONE)
+    except ZoneInfoNotFoundError:
+        return timezone.utc
+
+
+def quota_day(now=None):
+    """Døgnet (YYYY-MM-DD) et kald tælles i"""
+    return datetime.fromtimestamp(now or time.time(), quota_timezone()).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset(now=None):
+    """Sekunder til døgnkvoterne nulstilles ved næste midnat"""
+    current = datetime.fromtimestamp(now or time.time(), quota_timezone())
+    midnight = (current + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - current).total_seconds()
+
+
+class Quota:
+    """En udbyders grænser: kald per minut og kvote-enheder per døgn (None = ingen grænse)"""
+
+    def __init__(self, provider, per_minute=None, per_day=None):
+        self.provider = provider
+        self.per_minute = per_minute or None
+        self.per_day = per_day or None
+
+    def minute_allowance(self, priority):
+        """Antal kald i minutvinduet prioriteten må bruge - mindst ét"""
+        return max(1, self.per_minute - int(self.per_minute * RESERVES[priority]))
+
+    def day_allowance(self, priority):
+        return self.per_day - int(self.per_day * RESERVES[priority])
+
+
+# Udbydere hvor alle grænser er sat til 0 har ingen kvote
+quotas = {
+    quota.provider: quota for quota in (
+        Quota("nyt", per_minute=NYT_RATE_PER_MINUTE, per_day=NYT_QUOTA_PER_DAY),
+        Quota("youtube", per_day=YOUTUBE_QUOTA_PER_DAY),
+    )
+    if quota.per_minute or quota.per_day
+}
+
+
+class Ledger:
+    """Fælles regnskab (SQLite) over kald til udbydere med kvoter
+
+    Alle worker processer og background callbacks tæller i samme fil, så grænserne
+    gælder for API nøglen og ikke per proces. Et kald registreres før det sendes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path("quota", "ledger.sqlite")
+        self.local = threading.local()
+        self.writes = 0
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "provider TEXT NOT NULL, at REAL NOT NULL, day TEXT NOT NULL, units INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS calls_provider_at ON calls (provider, at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS calls_provider_day ON calls (provider, day)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cooldowns (provider TEXT PRIMARY KEY, until REAL NOT NULL)")
+
+    def connect(self):
+        """Én forbindelse per tråd - forbindelser må ikke deles på tværs af fork"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def usage(self, conn, quota, now):
+        """(tidspunkter for kald i minutvinduet, brugte enheder i dag, pause til) for en udbyder"""
+        window = [row[0] for row in conn.execute(
+            "SELECT at FROM calls WHERE provider = ? AND at > ? ORDER BY at", (quota.provider, now - WINDOW)
+        )] if quota.per_minute else []
+        day_used = conn.execute(
+            "SELECT COALESCE(SUM(units), 0) FROM calls WHERE provider = ? AND day = ?", (quota.provider, quota_day(now))
+        ).fetchone()[0]
+        row = conn.execute("SELECT until FROM cooldowns WHERE provider = ?", (quota.provider,)).fetchone()
+        return window, day_used, row[0] if row else 0
+
+    def admit(self, quota, units, priority):
+        """Registrerer kaldet og returnerer (0, None) hvis det må sendes
+
+        Ellers returneres (sekunder til det tidligst må sendes, grænsen der er nået).
+        Er døgnkvoten for prioriteten brugt op, er ventetiden tiden til næste nulstilling.
+        """
+        conn = self.connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            window, day_used, cooldown_until = self.usage(conn, quota, now)
+            if cooldown_until > now:
+                wait, limit = cooldown_until - now, "cooldown"
+            elif quota.per_day and day_used + units > quota.day_allowance(priority):
+                wait, limit = seconds_until_reset(now), "day"
+            elif quota.per_minute and len(window) >= quota.minute_allowance(priority):
+                # Vent til nok af de ældste kald er gledet ud af vinduet
+                wait, limit = window[len(window) - quota.minute_allowance(priority)] + WINDOW - now, "minute"
+            else:
+                conn.execute(
+                    "INSERT INTO calls (provider, at, day, units) VALUES (?, ?, ?, ?)",
+                    (quota.provider, now, quota_day(now), units)
+                )
+                wait, limit = 0, None
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if limit is None:
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self.prune()
+        return max(wait, 0), limit
+
+    def back_off(self, provider, seconds):
+        """Stopper alle kald til udbyderen i seconds sekunder (f.eks. efter et 429 svar)"""
+        conn = self.connect()
+        until = time.time() + seconds
+        conn.execute(
+            "INSERT INTO cooldowns (provider, until) VALUES (?, ?) "
+            "ON CONFLICT (provider) DO UPDATE SET until = MAX(until, excluded.until)",
+            (provider, until)
+        )
+
+    def report(self):
+        """Brugt og resterende kvote per udbyder"""
+        conn = self.connect()
+        now = time.time()
+        report = {}
+        for provider, quota in quotas.items():
+            window, day_used, cooldown_until = self.usage(conn, quota, now)
+            report[provider] = {
+                "minute": {
+                    "limit": quota.per_minute,
+                    "used": len(window),
+                    "remaining": max(quota.per_minute - len(window), 0)
+                } if quota.per_minute else None,
+                "day": {
+                    "limit": quota.per_day,
+                    "used": day_used,
+                    "remaining": max(quota.per_day - day_used, 0),
+                    "resets_in": round(seconds_until_reset(now))
+                } if quota.per_day else None,
+                "cooldown": round(max(cooldown_until - now, 0), 1)
+            }
+        return report
+
+    def prune(self):
+        """Fjerner kald der er ældre end to døgn"""
+        conn = self.connect()
+        conn.execute("DELETE FROM calls WHERE at < ?", (time.time() - 2 * 86400,))
+        conn.execute("DELETE FROM cooldowns WHERE until < ?", (time.time(),))
+
+    def clear(self):
+        conn = self.connect()
+        conn.execute("DELETE FROM calls")
+        conn.execute("DELETE FROM cooldowns")
+
+
+ledger = Ledger()
+
+
+def acquire(provider, timeout=None, priority=REFRESH, units=1):
+    """Venter op til timeout sekunder på plads i udbyderens kvote - udbydere uden kvote er altid tilladt
+
+    Kald der ikke kan nå at komme igennem inden for timeout afvises med det samme
+    med RateLimitExceeded i stedet for at vente forgæves.
+    """
+    quota = quotas.get(provider)
+    if quota is None:
+        return
+    deadline = None if timeout is None else time.monotonic() + timeout
+    queued = False
+    while True:
+        wait, limit = ledger.admit(quota, units, priority)
+        if limit is None:
+            metrics.inc("mashup_quota_requests_total", provider=provider, priority=priority,
+                        result="queued" if queued else "admitted")
+            return
+        if deadline is not None and time.monotonic() + wait > deadline:
+            metrics.inc("mashup_quota_requests_total", provider=provider, priority=priority, result="shed")
+            if limit == "day":
+                raise RateLimitExceeded(f"Dagens kvote for {provider} er brugt op - prøv igen i morgen")
+            if limit == "cooldown":
+                raise RateLimitExceeded(f"{provider} har bedt om en pause - prøv igen om {wait:.0f} sekunder")
+            raise RateLimitExceeded(f"Rate limit for {provider} er nået - prøv igen om {wait:.0f} sekunder")
+        queued = True
+        time.sleep(min(wait, 1.0))
+
+
+def retry_after(response):
+    """Sekunder fra en Retry-After header - None hvis den mangler eller er en dato"""
+    try:
+        return max(float(response.headers.get("Retry-After")), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_response(provider, response):
+    """Holder pause hvis udbyderen alligevel melder rate limit eller opbrugt kvote"""
+    if provider not in quotas:
+        return
+    if response.status_code == 429:
+        ledger.back_off(provider, retry_after(response) or BACK_OFF)
+    elif response.status_code == 403 and "quotaExceeded" in response.text:
+        # YouTube svarer 403 quotaExceeded når døgnets enheder er brugt
+        ledger.back_off(provider, seconds_until_reset())
+
+
+def init_app(server):
+    """Registrerer /quota med brugt og resterende kvote per udbyder"""
+
+    @server.route("/quota")
+    def quota():
+        return jsonify(ledger.report())
@@ -0,0 +1,32 @@
+import os
+from dotenv import load_dotenv
+from utils.cache import cached_get
+
+load_dotenv()
+
+# Alle bøger med de felter Books siden viser, nyeste først
+BOOKS_QUERY = '''*[_type == 'book'] {
+    _id,
+    _createdAt,
+    _updatedAt,
+    title,
+    number,
+    date,
+    completed
+} | order(_createdAt desc)'''
+
+# Statistik til forsiden - tælles af Sanity, så kun to tal sendes over nettet
+BOOK_STATS_QUERY = '''{
+    "total": count(*[_type == 'book']),
+    "completed": count(*[_type == 'book' && completed == true])
+}'''
+
+def sanity_query(query, refresh=False):
+    """Kører en GROQ query mod Sanity gennem den fælles cache - None hvis Sanity ikke er sat op"""
+    project_id = os.getenv("SANITY_PROJECT_ID", "")
+    if not project_id:
+        return None
+    dataset = os.getenv("SANITY_DATASET", "production")
+    api_version = os.getenv("SANITY_API_VERSION", "2023-01-01")
+    url = f"https://{project_id}.api.sanity.io/v{api_version}/data/query/{dataset}"
+    return cached_get("sanity", url, params={"query": query}, refresh=refresh)
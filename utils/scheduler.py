@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.paths import data_path
+
+try:
+    import fcntl
+except ImportError:  # Windows - der køres kun én proces, som altid er leder
+    fcntl = None
+
+# Hvor ofte (sekunder) scheduleren tjekker om et job skal opdateres
+TICK_INTERVAL = 1.0
+
+# Ventetid (sekunder) før et fejlet job forsøges igen
+RETRY_INTERVAL = 30
+
+# Deaktiver baggrundsopdatering med SCHEDULER_ENABLED=0
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+
+
+class Job:
+    """Et navngivet datasæt der opdateres med et fast interval"""
+
+    def __init__(self, name, fetch, interval, is_valid=None, age=None, stored=None):
+        self.name = name
+        self.fetch = fetch
+        self.interval = interval
+        self.is_valid = is_valid or (lambda value: value is not None)
+        # age(value) -> sekunder siden værdien blev hentet, for værdier læst fra disk
+        self.age = age
+        # stored() -> seneste gemte værdi (f.eks. fra spejlet) eller None - uden kald til API'et
+        self.stored = stored
+        self.value = None
+        self.error = None
+        self.updated_at = None
+        self.lock = threading.Lock()
+        self.refreshing = False
+
+    def is_stale(self):
+        return self.updated_at is None or time.monotonic() - self.updated_at >= self.interval
+
+
+class Scheduler:
+    """Holder provider-data varm i baggrunden og serverer den fra hukommelsen"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scheduler")
+        self.thread = None
+        self.stop_event = threading.Event()
+        # Lederen henter friske data fra API'erne, de andre processer læser den delte cache
+        self.leader = True
+        self.lock_file = None
+
+    def register(self, name, fetch, interval, is_valid=None, age=None, stored=None):
+        """Registrerer et job - fetch kaldes med refresh=True ved opdatering i baggrunden
+
+        Med age regnes en gammel værdi fra disk som forældet med det samme, så den vises
+        mens en frisk værdi hentes i baggrunden. Med stored vises den gemte værdi med det
+        samme efter en genstart, og den bruges hvis opdateringen fejler.
+        """
+        self.jobs[name] = Job(name, fetch, interval, is_valid, age, stored)
+
+    def stored_value(self, job):
+        """Jobbets gemte værdi hvis den er gyldig - ellers None"""
+        if job.stored is None:
+            return None
+        try:
+            value = job.stored()
+        except Exception:
+            return None
+        return value if job.is_valid(value) else None
+
+    def seed(self, job):
+        """Viser den gemte værdi før første hentning - den regnes som hentet for age sekunder siden"""
+        if job.value is not None:
+            return
+        value = self.stored_value(job)
+        if value is None:
+            return
+        age = job.interval if job.age is None else min(max(job.age(value), 0), job.interval)
+        job.value = value
+        job.updated_at = time.monotonic() - age
+
+    def refresh(self, name, only_if_empty=False):
+        """Henter frisk data for et job - en gyldig gammel værdi beholdes ved fejl"""
+        job = self.jobs[name]
+        with job.lock:
+            # En anden tråd kan have hentet data mens vi ventede på låsen
+            if only_if_empty and job.updated_at is not None:
+                return job.value
+            try:
+                # Første hentning må gerne komme fra cache, senere opdateringer skal være friske.
+                # Processer der ikke er leder læser blot den delte cache.
+                value = job.fetch(refresh=self.leader and not only_if_empty)
+            except Exception as e:
+                # Prøv igen efter RETRY_INTERVAL i stedet for et helt interval - er der intet
+                # data endnu, vises den gemte værdi i mellemtiden
+                job.error = e
+                if job.value is None:
+                    job.value = self.stored_value(job)
+                job.updated_at = time.monotonic() - max(job.interval - RETRY_INTERVAL, 0)
+                return job.value
+            finally:
+                job.refreshing = False
+            age = 0
+            if job.is_valid(value) or job.value is None:
+                job.value = value
+                job.error = None
+                if job.age is not None and value is not None:
+                    age = min(max(job.age(value), 0), job.interval)
+            job.updated_at = time.monotonic() - age
+            return job.value
+
+    def refresh_async(self, name):
+        """Starter en opdatering i baggrunden hvis der ikke allerede kører en"""
+        job = self.jobs[name]
+        if job.refreshing:
+            return
+        job.refreshing = True
+        self.executor.submit(self.refresh, name)
+
+    def get(self, name):
+        """Stale-while-revalidate: returnerer seneste værdi og opdaterer i baggrunden hvis den er gammel"""
+        job = self.jobs[name]
+        if job.updated_at is None:
+            self.seed(job)
+        if job.updated_at is None:
+            # Intet data endnu - vent på (eller del) den første hentning
+            self.refresh(name, only_if_empty=True)
+        elif job.is_stale():
+            self.refresh_async(name)
+        # Fejlen vises kun hvis der aldrig er hentet data
+        if job.value is None and job.error is not None:
+            raise job.error
+        return job.value
+
+    def try_lead(self):
+        """Forsøger at blive leder via en fil-lås - låsen frigives når processen stopper"""
+        if fcntl is None:
+            return True
+        if self.lock_file is None:
+            self.lock_file = open(data_path("scheduler.lock"), "w")
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def run(self):
+        while not self.stop_event.wait(TICK_INTERVAL):
+            # Overtag ledelsen hvis lederens proces er stoppet
+            if not self.leader:
+                self.leader = self.try_lead()
+            for name, job in self.jobs.items():
+                if job.is_stale():
+                    self.refresh_async(name)
+
+    def start(self, elect_leader=False):
+        """Starter baggrundstråden - jobs vises fra deres gemte værdi og opdateres hvis den er forældet
+
+        Med elect_leader=True (flere worker processer med delt cache) henter kun én
+        proces fra API'erne, mens de andre holder sig opdateret fra den delte cache.
+        """
+        if not SCHEDULER_ENABLED or self.thread is not None:
+            return
+        self.leader = self.try_lead() if elect_leader else True
+        for name, job in self.jobs.items():
+            self.seed(job)
+            if job.is_stale():
+                self.refresh_async(name)
+        self.thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+scheduler = Scheduler()
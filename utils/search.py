@@ -0,0 +1,248 @@
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from utils.images import responsive_image
+from utils.scheduler import scheduler
+from utils.store import mirror
+
+# BM25 parametre - k1 styrer hvor hurtigt gentagne ord mister værdi, b hvor meget lange tekster straffes
+K1 = 1.2
+B = 0.75
+
+# Titler tæller som om de stod så mange gange i teksten
+TITLE_WEIGHT = 3
+
+# Højeste antal termer et ufærdigt sidste ord (præfiks) udvides til
+MAX_PREFIX_TERMS = 50
+
+# Hvor ofte (sekunder) spejlet højst tjekkes for nye data ved søgning
+SYNC_INTERVAL = 1.0
+
+# Hvor ofte (sekunder) scheduleren opdaterer indekset i baggrunden, så første søgning er hurtig
+INDEX_REFRESH_INTERVAL = 30
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Små bogstaver, accenter fjernet (men æ, ø og å bevaret) og opdelt i ord"""
+    text = (text or "").lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char) or char == "\u030a")
+        text = unicodedata.normalize("NFC", text)
+    return TOKEN_PATTERN.findall(text)
+
+
+def news_document(article):
+    renditions = article["media"][0].get("media-metadata", []) if article.get("media") else []
+    return {
+        "id": f"news:{article['id']}",
+        "title": article.get("title", ""),
+        "text": " ".join(filter(None, [article.get("abstract"), article.get("byline"), article.get("section")])),
+        "record": {
+            "source": "News",
+            "title": article.get("title", ""),
+            "text": article.get("abstract", ""),
+            "meta": " | ".join(filter(None, [article.get("section"), article.get("published_date")])),
+            "url": article.get("url"),
+            "image": responsive_image(renditions)
+        }
+    }
+
+
+def music_document(item):
+    return {
+        "id": f"music:{item['videoId']}",
+        "title": item.get("title", ""),
+        "text": " ".join(filter(None, [item.get("description"), item.get("channelTitle")])),
+        "record": {
+            "source": "Music",
+            "title": item.get("title", ""),
+            "text": item.get("description", "")[:200],
+            "meta": item.get("channelTitle", ""),
+            "url": f"https://www.youtube.com/watch?v={item['videoId']}",
+            "image": responsive_image([thumb for thumb in item.get("thumbnails", {}).values() if isinstance(thumb, dict)])
+        }
+    }
+
+
+def movie_document(item):
+    movie = item.get("movie", {})
+    ids = movie.get("ids", {})
+    slug = ids.get("slug") or ids.get("trakt")
+    title = f"{movie.get('title', '')} ({movie.get('year', '')})"
+    return {
+        # Genudsete film findes flere gange i historikken - kun den nyeste visning indekseres
+        "id": f"movies:{slug}",
+        "title": title,
+        "text": movie.get("overview", ""),
+        "record": {
+            "source": "Movies",
+            "title": title,
+            "text": (movie.get("overview") or "")[:200],
+            "meta": f"Set: {item.get('watched_at', '')[:10]}",
+            "url": f"https://trakt.tv/movies/{slug}",
+            "image": None
+        }
+    }
+
+
+def book_document(book):
+    meta = " | ".join(filter(None, [
+        f"Nummer: {book['number']}" if book.get("number") else "",
+        "Færdig" if book.get("completed") else "I gang"
+    ]))
+    return {
+        "id": f"books:{book.get('_id')}",
+        "title": book.get("title", ""),
+        "text": str(book.get("number") or ""),
+        "record": {"source": "Books", "title": book.get("title", ""), "text": "", "meta": meta, "url": None, "image": None}
+    }
+
+
+# datasæt i spejlet -> (tabel, funktion der laver et søgbart dokument af et item)
+SOURCES = {
+    "nyt_most_viewed": ("nyt_articles", news_document),
+    "youtube_playlist": ("youtube_items", music_document),
+    "trakt_history": ("trakt_history", movie_document),
+    "sanity_books": ("sanity_books", book_document),
+}
+
+
+class SearchIndex:
+    """Inverteret indeks med BM25 rangering over alt hvad appen har hentet
+
+    Indekset bygges i hver proces ud fra det lokale spejl (utils/store.py) og opdateres
+    inkrementelt når et datasæt får en ny version - søgninger kalder aldrig et API.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # postings: term -> {dokument id: antal forekomster}
+        self.postings = {}
+        # documents: dokument id -> (datasæt, længde, termer, record)
+        self.documents = {}
+        self.total_length = 0
+        self.terms = []
+        self.terms_dirty = False
+        self.versions = {}
+        self.checked_at = 0
+
+    def add(self, dataset, document):
+        counts = {}
+        for term in tokenize(document["title"]) * TITLE_WEIGHT + tokenize(document["text"]):
+            counts[term] = counts.get(term, 0) + 1
+        length = sum(counts.values())
+        self.documents[document["id"]] = (dataset, length, counts, document["record"])
+        self.total_length += length
+        for term, count in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self.terms_dirty = True
+            postings[document["id"]] = count
+
+    def remove(self, doc_id):
+        _, length, counts, _ = self.documents.pop(doc_id)
+        self.total_length -= length
+        for term in counts:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                self.terms_dirty = True
+
+    def update_dataset(self, dataset, documents):
+        """Erstatter et datasæts dokumenter - kun nye, ændrede og fjernede dokumenter røres"""
+        new = {}
+        for document in documents:
+            new.setdefault(document["id"], document)
+        with self.lock:
+            for doc_id in [doc_id for doc_id, entry in self.documents.items() if entry[0] == dataset]:
+                document = new.get(doc_id)
+                if document is None or document["record"] != self.documents[doc_id][3]:
+                    self.remove(doc_id)
+            for doc_id, document in new.items():
+                if doc_id not in self.documents:
+                    self.add(dataset, document)
+
+    def sync(self, force=False):
+        """Indekserer datasæt fra spejlet der har fået en ny version siden sidst"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < SYNC_INTERVAL:
+            return
+        self.checked_at = now
+        versions = mirror.versions()
+        for dataset, (table, make_document) in SOURCES.items():
+            version = versions.get(dataset)
+            if version == self.versions.get(dataset):
+                continue
+            self.update_dataset(dataset, [make_document(item) for item in mirror.items(table)])
+            self.versions[dataset] = version
+
+    def expand(self, token, is_last):
+        """Termer et ord matcher - det sidste ord i søgningen matcher også som præfiks"""
+        if not is_last or len(token) < 2:
+            return [token] if token in self.postings else []
+        if self.terms_dirty:
+            self.terms = sorted(self.postings)
+            self.terms_dirty = False
+        start = bisect.bisect_left(self.terms, token)
+        matches = []
+        for term in self.terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query, limit=None):
+        """Returnerer (records sorteret efter BM25 score, antal træffere)"""
+        self.sync()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+        with self.lock:
+            count = len(self.documents)
+            if not count:
+                return [], 0
+            average_length = self.total_length / count
+            scores = {}
+            for i, token in enumerate(tokens):
+                for term in self.expand(token, i == len(tokens) - 1):
+                    postings = self.postings[term]
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, frequency in postings.items():
+                        length = self.documents[doc_id][1]
+                        score = idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+                        scores[doc_id] = scores.get(doc_id, 0) + score
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            if limit is not None:
+                ranked = ranked[:limit]
+            return [self.documents[doc_id][3] for doc_id, _ in ranked], len(scores)
+
+    def clear(self):
+        with self.lock:
+            self.postings = {}
+            self.documents = {}
+            self.total_length = 0
+            self.terms = []
+            self.terms_dirty = False
+            self.versions = {}
+            self.checked_at = 0
+
+
+search_index = SearchIndex()
+
+
+def refresh_index(refresh=False):
+    """Holder indekset i denne proces opdateret fra spejlet - kalder aldrig et API"""
+    search_index.sync(force=True)
+    return len(search_index.documents)
+
+
+scheduler.register("search_index", refresh_index, INDEX_REFRESH_INTERVAL)
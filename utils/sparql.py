@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from string import Template
+
+from utils import http_client, metrics
+from utils.cache import cached_call
+from utils.paths import data_path
+
+DBPEDIA_ENDPOINT = os.getenv("DBPEDIA_ENDPOINT", "https://dbpedia.org/sparql")
+
+# Hård grænse (sekunder) for hvor længe én SPARQL query må tage
+QUERY_BUDGET = float(os.getenv("DBPEDIA_QUERY_BUDGET", "8"))
+
+# Hvor længe resultater gemmes i disk cachen (sekunder)
+DISK_CACHE_TTL = int(os.getenv("DBPEDIA_DISK_CACHE_TTL", str(7 * 24 * 3600)))
+
+PREFIXES = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+"""
+
+PREFIXES_BIF = PREFIXES + """PREFIX bif: <bif:>
+"""
+
+# Ontologi-klasser der søges i, med navnet der vises på kortene
+SEARCH_TYPES = {
+    "Film": "dbo:Film",
+    "Bog": "dbo:Book",
+    "Band": "dbo:Band",
+    "Musiker": "dbo:MusicalArtist",
+    "Forfatter": "dbo:Writer",
+}
+
+# Parametre ($type, $text, $term, $limit) indsættes escaped af render_query - aldrig med f-strings.
+# Fuldtekst-indekset (bif:contains) finder kandidaterne, og contains-filteret tjekker
+# kun dem - så endpointet ikke skal gennemløbe og lowercase alle titler.
+LABEL_SEARCH = Template(PREFIXES_BIF + """
+SELECT DISTINCT ?subject ?label ?abstract
+WHERE {
+    ?label bif:contains $text .
+    ?subject rdfs:label ?label .
+    FILTER (lang(?label) = "en")
+    FILTER (contains(lcase(?label), $term))
+    ?subject rdf:type $type .
+    OPTIONAL {
+        ?subject rdfs:comment ?abstract .
+        FILTER (lang(?abstract) = "en")
+    }
+}
+LIMIT $limit
+""")
+
+# Fallback uden indeks - bruges kun når søgningen ikke har ord indekset kan slå op
+LABEL_SEARCH_SUBSTRING = Template(PREFIXES + """
+SELECT DISTINCT ?subject ?label ?abstract
+WHERE {
+    ?subject rdf:type $type .
+    ?subject rdfs:label ?label .
+    FILTER (lang(?label) = "en")
+    FILTER (contains(lcase(?label), $term))
+    OPTIONAL {
+        ?subject rdfs:comment ?abstract .
+        FILTER (lang(?abstract) = "en")
+    }
+}
+LIMIT $limit
+""")
+
+# Ord som Virtuoso's fuldtekst-indeks ignorerer eller tolker som operatorer
+STOP_WORDS = {"the", "and", "not", "near", "with", "from", "into", "that", "this", "what"}
+
+# Virtuoso kræver mindst 4 tegn før et wildcard
+MIN_WORD_LENGTH = 4
+
+# executor kører de enkelte HTTP kald, search_executor fordeler en søgning på klasserne
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sparql")
+search_executor = ThreadPoolExecutor(max_workers=len(SEARCH_TYPES), thread_name_prefix="sparql-search")
+
+
+class SparqlError(Exception):
+    """En SPARQL query fejlede eller overskred sit tidsbudget"""
+
+
+class SparqlTimeout(SparqlError):
+    """En SPARQL query overskred sit tidsbudget"""
+
+
+class SparqlRejected(SparqlError):
+    """Endpointet afviste selve queryen (HTTP 400) - f.eks. et fuldtekst-udtryk det ikke kan parse"""
+
+
+class PrefixedName(str):
+    """Et betroet navn som dbo:Film der indsættes uden at blive gjort til en literal"""
+
+    def __new__(cls, value):
+        if not re.fullmatch(r"[A-Za-z]\w*:[A-Za-z]\w*", value):
+            raise ValueError(f"Ugyldigt prefixed name: {value!r}")
+        return super().__new__(cls, value)
+
+
+def sparql_literal(value):
+    """Escaper en værdi som SPARQL string literal"""
+    escaped = (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\t", "\\t")
+    )
+    return f'"{escaped}"'
+
+
+def render_query(template, **params):
+    """Indsætter parametre i en query template - strenge som literals, tal som tal"""
+    values = {}
+    for name, value in params.items():
+        if isinstance(value, PrefixedName):
+            values[name] = str(value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            values[name] = str(value)
+        else:
+            values[name] = sparql_literal(value)
+    return template.substitute(values)
+
+
+def normalize_term(term):
+    """Små bogstaver og enkelt mellemrum, så varianter af samme søgning deler cache"""
+    return " ".join(str(term).lower().split())
+
+
+def text_expression(term):
+    """Bygger et bif:contains udtryk af søgetermens indekserbare ord - None hvis der ingen er
+
+    Hvert ord citeres og får prefix-wildcard, så 'harry pott' også finder 'Harry Potter'.
+    Kortere ord og stopord udelades og tjekkes i stedet af contains-filteret.
+    """
+    words = [
+        word for word in re.findall(r"\w+", normalize_term(term))
+        if len(word) >= MIN_WORD_LENGTH and word not in STOP_WORDS
+    ]
+    if not words:
+        return None
+    return " AND ".join(f'"{word}*"' for word in words)
+
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+
+class ResultCache:
+    """SQLite cache af result bindings, nøglet på den normaliserede query"""
+
+    def __init__(self, path=None, ttl=DISK_CACHE_TTL):
+        self.path = path or data_path("dbpedia", "results.sqlite")
+        self.ttl = ttl
+        self.local = threading.local()
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, bindings TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def connect(self):
+        """Én forbindelse per tråd - forbindelser må ikke deles på tværs af fork"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, key, stale=False):
+        """Med stale=True returneres også resultater ældre end ttl - bruges når endpointet er nede"""
+        row = self.connect().execute(
+            "SELECT bindings FROM results WHERE key = ? AND created_at > ?",
+            (key, 0 if stale else time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, bindings):
+        self.connect().execute(
+            "INSERT OR REPLACE INTO results (key, bindings, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(bindings), time.time())
+        )
+
+    def clear(self):
+        self.connect().execute("DELETE FROM results")
+
+
+result_cache = ResultCache()
+
+
+def run_query(query):
+    """Sender en query til endpointet - Virtuoso får også budgettet som server-side timeout"""
+    response = http_client.get(
+        "dbpedia",
+        DBPEDIA_ENDPOINT,
+        params={
+            "query": query,
+            "format": "application/sparql-results+json",
+            "timeout": int(QUERY_BUDGET * 1000)
+        },
+        timeout=(3.05, QUERY_BUDGET)
+    )
+    if response.status_code == 400:
+        raise SparqlRejected(f"DBpedia afviste queryen: {response.text[:200]}")
+    if response.status_code != 200:
+        raise SparqlError(f"DBpedia svarede {response.status_code}: {response.text[:200]}")
+    return response.json().get("results", {}).get("bindings", [])
+
+
+def execute(query):
+    """Returnerer result bindings fra hukommelse, disk eller endpointet - inden for QUERY_BUDGET"""
+    query = normalize_query(query)
+    key = hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    def fetch():
+        bindings = result_cache.get(key)
+        if bindings is not None:
+            metrics.inc("mashup_cache_requests_total", provider="dbpedia_disk", result="hit")
+            return bindings
+        metrics.inc("mashup_cache_requests_total", provider="dbpedia_disk", result="miss")
+        future = executor.submit(run_query, query)
+        try:
+            bindings = future.result(timeout=QUERY_BUDGET)
+        except Exception as e:
+            # Endpointet er nede eller kredsløbet er åbent - vis et ældre resultat hvis vi har et
+            bindings = result_cache.get(key, stale=True)
+            if bindings is not None:
+                metrics.inc("mashup_cache_requests_total", provider="dbpedia_disk", result="stale")
+                return bindings
+            if isinstance(e, FutureTimeout):
+                future.cancel()
+                metrics.inc("mashup_upstream_errors_total", provider="dbpedia", error="query_budget")
+                raise SparqlTimeout(f"DBpedia svarede ikke inden for {QUERY_BUDGET:g} sekunder")
+            raise
+        result_cache.set(key, bindings)
+        return bindings
+
+    return cached_call("dbpedia", key, fetch)
+
+
+def search_type(term, type_name, limit=10):
+    """Søger i én ontologi-klasse efter ressourcer hvis engelske label indeholder søgetermen"""
+    term = normalize_term(term)
+    rdf_type = PrefixedName(SEARCH_TYPES[type_name])
+    text = text_expression(term)
+    if text is not None:
+        try:
+            return execute(render_query(LABEL_SEARCH, type=rdf_type, text=text, term=term, limit=limit))
+        except SparqlRejected:
+            # Endpointet afviste fuldtekst-udtrykket - prøv uden indeks. Rate limits, fejl
+            # hos DBpedia og timeouts rejses videre, så de ikke koster et kald mere
+            pass
+    return execute(render_query(LABEL_SEARCH_SUBSTRING, type=rdf_type, term=term, limit=limit))
+
+
+def rank(result, term):
+    """Sorteringsnøgle: eksakt titel, så titler der starter med termen, så korteste titel"""
+    label = result["label"].lower()
+    return (label != term, not label.startswith(term), len(label))
+
+
+def search_all(term, limit=10, on_progress=None):
+    """Søger i alle SEARCH_TYPES samtidigt og fletter resultaterne efterhånden som de kommer ind
+
+    Hver klasse er sin egen cachede query med eget tidsbudget, så den samlede søgning
+    aldrig tager længere end den langsomste klasse. Fejler alle klasser, rejses den første fejl.
+    on_progress(færdige, i alt) kaldes hver gang en klasse er færdig.
+    """
+    term = normalize_term(term)
+    futures = {search_executor.submit(search_type, term, type_name, limit): type_name for type_name in SEARCH_TYPES}
+    results = {}
+    errors = []
+    for done, future in enumerate(as_completed(futures), start=1):
+        if on_progress is not None:
+            on_progress(done, len(futures))
+        try:
+            bindings = future.result()
+        except Exception as e:
+            errors.append(e)
+            continue
+        for binding in bindings:
+            subject = binding.get("subject", {}).get("value", "")
+            if not subject or subject in results:
+                continue
+            results[subject] = {
+                "subject": subject,
+                "label": binding.get("label", {}).get("value", "No label"),
+                "abstract": binding.get("abstract", {}).get("value", "No description available"),
+                "type": futures[future]
+            }
+    if not results and len(errors) == len(futures):
+        raise errors[0]
+    return sorted(results.values(), key=lambda result: rank(result, term))
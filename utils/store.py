@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.pagination import DEFAULT_PAGE_SIZE, page_count
+from utils.paths import data_path
+
+# Tabeller i spejlet - én række per item med id, plads i listen, dato og de felter siderne bruger
+TABLES = ("nyt_articles", "youtube_items", "trakt_history", "sanity_books")
+
+
+class Mirror:
+    """Lokal SQLite kopi af alle udbyderes data, som siderne læser fra
+
+    Udbyderne (utils/providers.py) fodrer spejlet efter hver vellykket hentning, så siderne
+    kan vises med det samme efter en genstart og med seneste gode data når et API er nede.
+    Datasættenes metadata (antal, rollups, tidspunkt) ligger i tabellen datasets.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path("store", "mirror.sqlite")
+        self.local = threading.local()
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS datasets ("
+            "name TEXT PRIMARY KEY, summary TEXT NOT NULL, version TEXT, updated_at REAL NOT NULL)"
+        )
+        for table in TABLES:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id TEXT PRIMARY KEY, position INTEGER NOT NULL, date TEXT, data TEXT NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_position ON {table} (position)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_date ON {table} (date)")
+
+    def connect(self):
+        """Én forbindelse per tråd - forbindelser må ikke deles på tværs af fork"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None or getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def summary(self, name):
+        """Metadata for et datasæt (med updated_at) - None hvis det aldrig er gemt"""
+        row = self.connect().execute(
+            "SELECT summary, updated_at FROM datasets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "updated_at": row[1]}
+
+    def save(self, name, summary, table=None, items=(), id_of=None, date_of=None):
+        """Erstatter et datasæts rækker og metadata i én transaktion - returnerer metadata
+
+        Rækkerne skrives kun hvis indholdet har ændret sig siden sidst.
+        """
+        rows = []
+        if table is not None:
+            for position, item in enumerate(items):
+                rows.append((str(id_of(item)), position, date_of(item), json.dumps(item, ensure_ascii=False)))
+        digest = hashlib.sha256()
+        digest.update(json.dumps(summary, sort_keys=True).encode("utf-8"))
+        for row in rows:
+            digest.update(row[3].encode("utf-8"))
+        version = digest.hexdigest()
+        updated_at = time.time()
+
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("SELECT version FROM datasets WHERE name = ?", (name,)).fetchone()
+            if table is not None and (current is None or current[0] != version):
+                conn.execute(f"DELETE FROM {table}")
+                # Samme id kan forekomme flere gange i en liste - første forekomst beholdes
+                conn.executemany(f"INSERT OR IGNORE INTO {table} (id, position, date, data) VALUES (?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO datasets (name, summary, version, updated_at) VALUES (?, ?, ?, ?)",
+                (name, json.dumps(summary, ensure_ascii=False), version, updated_at)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return {**summary, "updated_at": updated_at}
+
+    def page(self, table, active_page, page_size):
+        """Returnerer (synlige items, aktiv side, antal sider) direkte fra databasen"""
+        page_size = int(page_size or DEFAULT_PAGE_SIZE)
+        conn = self.connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        max_page = page_count(total, page_size)
+        active_page = min(max(int(active_page or 1), 1), max_page)
+        rows = conn.execute(
+            f"SELECT data FROM {table} ORDER BY position LIMIT ? OFFSET ?",
+            (page_size, (active_page - 1) * page_size)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows], active_page, max_page
+
+    def items(self, table):
+        """Alle items i en tabel i listens rækkefølge"""
+        rows = self.connect().execute(f"SELECT data FROM {table} ORDER BY position").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def versions(self):
+        """Indholdets version per datasæt - ændres kun når rækkerne eller metadata ændres"""
+        return dict(self.connect().execute("SELECT name, version FROM datasets").fetchall())
+
+    def clear(self):
+        conn = self.connect()
+        conn.execute("DELETE FROM datasets")
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table}")
+
+
+mirror = Mirror()
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from utils import http_client
+from utils.paths import data_path
+
+# Antal historik elementer per side - Trakt tillader højst 100
+PAGE_LIMIT = 100
+
+# Hvor ofte (sekunder) hele historikken hentes forfra, så slettede og rettede visninger kommer med
+FULL_SYNC_INTERVAL = int(os.getenv("TRAKT_FULL_SYNC_INTERVAL", "86400"))
+
+# Overviews forkortes i indekset - siden viser højst 200 tegn
+OVERVIEW_LENGTH = 300
+
+
+class TraktSyncError(Exception):
+    """Trakt svarede med en fejlstatus under synkronisering"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+
+
+def compact_item(item):
+    """Gemmer kun de felter fra en historik post som siderne bruger"""
+    movie = item.get("movie", {})
+    ids = movie.get("ids", {})
+    return {
+        "id": item.get("id"),
+        "watched_at": item.get("watched_at", ""),
+        "movie": {
+            "title": movie.get("title", "No title"),
+            "year": movie.get("year", ""),
+            "overview": (movie.get("overview") or "")[:OVERVIEW_LENGTH],
+            "ids": {"trakt": ids.get("trakt", ""), "slug": ids.get("slug", "")}
+        }
+    }
+
+
+def add_to_rollups(rollups, items):
+    """Tæller visninger per måned og år (UTC)"""
+    for item in items:
+        watched_at = item.get("watched_at")
+        if not watched_at:
+            continue
+        try:
+            dt = datetime.fromisoformat(watched_at.replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        month = dt.strftime("%Y-%m")
+        year = dt.strftime("%Y")
+        rollups["months"][month] = rollups["months"].get(month, 0) + 1
+        rollups["years"][year] = rollups["years"].get(year, 0) + 1
+
+
+def empty_rollups():
+    return {"months": {}, "years": {}}
+
+
+class HistorySync:
+    """Lokalt indeks over hele brugerens film historik med forudberegnede måneds- og årstal
+
+    Første synkronisering henter alle sider, derefter hentes kun visninger siden den
+    seneste (start_at). Hele historikken hentes forfra hver FULL_SYNC_INTERVAL sekund.
+    """
+
+    def __init__(self, username, path=None):
+        self.username = username
+        self.path = path or data_path("trakt", f"{username}.json")
+        self.lock = threading.Lock()
+        # items: historik poster, nyeste først
+        self.items = []
+        self.rollups = empty_rollups()
+        self.synced_at = None
+        self.full_synced_at = None
+        self.loaded_mtime = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        self.loaded_mtime = os.path.getmtime(self.path)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.items = index.get("items", [])
+        self.rollups = index.get("rollups") or empty_rollups()
+        self.synced_at = index.get("synced_at")
+        self.full_synced_at = index.get("full_synced_at")
+
+    def reload_if_changed(self):
+        """Indlæser indekset igen hvis en anden proces har synkroniseret siden sidst"""
+        if os.path.exists(self.path) and os.path.getmtime(self.path) != self.loaded_mtime:
+            with self.lock:
+                self.load()
+
+    def save(self):
+        index = {
+            "username": self.username,
+            "items": self.items,
+            "rollups": self.rollups,
+            "synced_at": self.synced_at,
+            "full_synced_at": self.full_synced_at
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.loaded_mtime = os.path.getmtime(self.path)
+
+    def clear(self):
+        """Glemmer indekset, så næste synkronisering henter hele historikken forfra"""
+        with self.lock:
+            self.items = []
+            self.rollups = empty_rollups()
+            self.synced_at = None
+            self.full_synced_at = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.loaded_mtime = None
+
+    def fetch_pages(self, start_at=None):
+        """Henter alle sider af historikken (eller kun visninger fra start_at) - nyeste først"""
+        url = f"https://api.trakt.tv/users/{self.username}/history/movies"
+        items = []
+        page = 1
+        while True:
+            params = {"page": page, "limit": PAGE_LIMIT}
+            if start_at:
+                params["start_at"] = start_at
+            response = http_client.get("trakt", url, params=params)
+            if response.status_code != 200:
+                raise TraktSyncError(response.status_code, response.text)
+            data = response.json()
+            items.extend(compact_item(item) for item in data)
+            page_count = int(response.headers.get("X-Pagination-Page-Count") or page)
+            if not data or page >= page_count:
+                return items
+            page += 1
+
+    def sync(self):
+        """Henter nye visninger (eller hele historikken) og opdaterer indeks og rollups"""
+        with self.lock:
+            now = time.time()
+            full = not self.items or self.full_synced_at is None or now - self.full_synced_at >= FULL_SYNC_INTERVAL
+            if full:
+                items = self.fetch_pages()
+                rollups = empty_rollups()
+                add_to_rollups(rollups, items)
+                self.items = items
+                self.rollups = rollups
+                self.full_synced_at = now
+            else:
+                # start_at er inklusiv, så visninger vi allerede har sorteres fra på id
+                known = {item["id"] for item in self.items if item["watched_at"] == self.items[0]["watched_at"]}
+                new_items = [item for item in self.fetch_pages(self.items[0]["watched_at"]) if item["id"] not in known]
+                if new_items:
+                    # Nye objekter i stedet for at ændre dem andre tråde kan være ved at læse
+                    rollups = {"months": dict(self.rollups["months"]), "years": dict(self.rollups["years"])}
+                    add_to_rollups(rollups, new_items)
+                    self.items = new_items + self.items
+                    self.rollups = rollups
+            self.synced_at = now
+            self.save()
+            return self.snapshot()
+
+    def snapshot(self):
+        """Returnerer historikken (nyeste først), antal og rollups per måned og år"""
+        return {
+            "items": self.items,
+            "total": len(self.items),
+            "months": self.rollups["months"],
+            "years": self.rollups["years"],
+            "synced_at": self.synced_at
+        }
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+
+from utils import http_client
+from utils.paths import data_path
+
+PLAYLIST_ITEMS_URL = "https://www.googleapis.com/youtube/v3/playlistItems"
+
+# Beskrivelser forkortes i indekset - siden viser højst 200 tegn
+DESCRIPTION_LENGTH = 300
+
+
+class PlaylistSyncError(Exception):
+    """YouTube svarede med en fejlstatus under synkronisering"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+
+
+def compact_item(item):
+    """Gemmer kun de felter fra et playlistItem som siderne bruger"""
+    snippet = item.get("snippet", {})
+    thumbnails = {
+        quality: {"url": thumb.get("url", ""), "width": thumb.get("width"), "height": thumb.get("height")}
+        for quality, thumb in snippet.get("thumbnails", {}).items()
+        if isinstance(thumb, dict)
+    }
+    return {
+        "videoId": snippet.get("resourceId", {}).get("videoId", ""),
+        "title": snippet.get("title", "No title"),
+        "description": snippet.get("description", "")[:DESCRIPTION_LENGTH],
+        "channelTitle": snippet.get("channelTitle", ""),
+        "publishedAt": snippet.get("publishedAt", ""),
+        "thumbnails": thumbnails
+    }
+
+
+class PlaylistSync:
+    """Lokalt indeks over en hel playlist, opdateret side for side med ETags"""
+
+    def __init__(self, playlist_id, path=None):
+        self.playlist_id = playlist_id
+        self.path = path or data_path("youtube", f"{playlist_id}.json")
+        self.lock = threading.Lock()
+        # pages: page token -> {"etag", "video_ids", "next"}; items: videoId -> kompakt item
+        self.pages = {}
+        self.items = {}
+        self.order = []
+        self.synced_at = None
+        self.loaded_mtime = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        self.loaded_mtime = os.path.getmtime(self.path)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.pages = index.get("pages", {})
+        self.items = index.get("items", {})
+        self.order = index.get("order", [])
+        self.synced_at = index.get("synced_at")
+
+    def reload_if_changed(self):
+        """Indlæser indekset igen hvis en anden proces har synkroniseret siden sidst"""
+        if os.path.exists(self.path) and os.path.getmtime(self.path) != self.loaded_mtime:
+            with self.lock:
+                self.load()
+
+    def save(self):
+        index = {
+            "playlist_id": self.playlist_id,
+            "pages": self.pages,
+            "items": self.items,
+            "order": self.order,
+            "synced_at": self.synced_at
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.loaded_mtime = os.path.getmtime(self.path)
+
+    def clear(self):
+        """Glemmer indekset, så næste synkronisering henter alle sider forfra"""
+        with self.lock:
+            self.pages = {}
+            self.items = {}
+            self.order = []
+            self.synced_at = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.loaded_mtime = None
+
+    def fetch_page(self, api_key, page_token):
+        """Henter én side - uændrede sider besvares med 304 og genbruges fra indekset"""
+        params = {
+            "part": "snippet",
+            "playlistId": self.playlist_id,
+            "maxResults": 50,
+            "key": api_key
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        known = self.pages.get(page_token)
+        headers = {"If-None-Match": known["etag"]} if known and known.get("etag") else None
+        response = http_client.get("youtube", PLAYLIST_ITEMS_URL, params=params, headers=headers)
+
+        if response.status_code == 304 and known:
+            return known, {}
+        if response.status_code != 200:
+            raise PlaylistSyncError(response.status_code, response.text)
+
+        data = response.json()
+        items = {}
+        for item in data.get("items", []):
+            compact = compact_item(item)
+            if compact["videoId"]:
+                items[compact["videoId"]] = compact
+        page = {
+            "etag": data.get("etag") or response.headers.get("ETag"),
+            "video_ids": list(items),
+            "next": data.get("nextPageToken")
+        }
+        return page, items
+
+    def sync(self, api_key):
+        """Går hele playlisten igennem og opdaterer indekset"""
+        with self.lock:
+            pages = {}
+            order = []
+            changed = {}
+            page_token = ""
+            while True:
+                page, items = self.fetch_page(api_key, page_token)
+                pages[page_token] = page
+                order.extend(page["video_ids"])
+                changed.update(items)
+                page_token = page.get("next")
+                if not page_token or page_token in pages:
+                    break
+
+            if changed or order != self.order:
+                self.items.update(changed)
+                # Fjern videoer der ikke længere er i playlisten
+                self.items = {video_id: self.items[video_id] for video_id in order if video_id in self.items}
+            self.pages = pages
+            self.order = order
+            self.synced_at = time.time()
+            self.save()
+            return self.snapshot()
+
+    def snapshot(self):
+        """Returnerer playlistens items i rækkefølge og det samlede antal"""
+        items = [self.items[video_id] for video_id in self.order if video_id in self.items]
+        return {"items": items, "total": len(items), "synced_at": self.synced_at}